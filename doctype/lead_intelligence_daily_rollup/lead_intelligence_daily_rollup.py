@@ -0,0 +1,41 @@
+# Copyright (c) 2024, Frappe Technologies and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import add_days, nowdate, now
+
+class LeadIntelligenceDailyRollup(Document):
+	"""Per user and day totals rolled up from Lead Intelligence Usage Stats for dashboards."""
+	pass
+
+def on_doctype_update():
+	"""Index the (date, user) key used by the rollup upsert and trend queries."""
+	frappe.db.add_unique("Lead Intelligence Daily Rollup", ["date", "user"], constraint_name="unique_date_user")
+
+def update_daily_rollup(days: int = 1, commit: bool = True):
+	"""Refresh rollup rows for the last N days from the raw usage stats (scheduled every 10 minutes)."""
+	timestamp = now()
+	
+	frappe.db.sql("""
+		INSERT INTO `tabLead Intelligence Daily Rollup`
+			(name, date, user, total_requests, total_cost, leads_generated, emails_sent,
+			success_rate, creation, modified, owner, modified_by)
+		SELECT
+			SUBSTRING(SHA1(CONCAT(user, '|', date)), 1, 16), date, user,
+			SUM(total_requests), SUM(total_cost), SUM(leads_generated), SUM(emails_sent),
+			AVG(success_rate), %(timestamp)s, %(timestamp)s, 'Administrator', 'Administrator'
+		FROM `tabLead Intelligence Usage Stats`
+		WHERE date >= %(from_date)s
+		GROUP BY date, user
+		ON DUPLICATE KEY UPDATE
+			total_requests = VALUES(total_requests),
+			total_cost = VALUES(total_cost),
+			leads_generated = VALUES(leads_generated),
+			emails_sent = VALUES(emails_sent),
+			success_rate = VALUES(success_rate),
+			modified = VALUES(modified)
+	""", {"timestamp": timestamp, "from_date": add_days(nowdate(), -days)})
+	
+	if commit:
+		frappe.db.commit()
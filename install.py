@@ -1,17 +1,381 @@
 # Copyright (c) 2024, Frappe Technologies and contributors
 # For license information, please see license.txt
 
+import copy
+
 import frappe
 from frappe.custom.doctype.custom_field.custom_field import create_custom_fields
 from frappe.custom.doctype.property_setter.property_setter import make_property_setter
 from frappe import _
+from frappe.utils import now
+from typing import Final
+
+
+INSTALL_SAVEPOINT = "li_install"
+
+# Custom fields Lead Intelligence adds to Lead, Customer and Contact
+CUSTOM_FIELDS: Final[dict[str, list[dict]]] = {
+	"Lead": [
+		{
+			"fieldname": "lead_intelligence_section",
+			"label": "Lead Intelligence",
+			"fieldtype": "Section Break",
+			"insert_after": "source",
+			"collapsible": 1
+		},
+		{
+			"fieldname": "lead_score",
+			"label": "Lead Score",
+			"fieldtype": "Int",
+			"insert_after": "lead_intelligence_section",
+			"read_only": 1,
+			"description": "AI-calculated lead quality score (0-100)"
+		},
+		{
+			"fieldname": "lead_quality",
+			"label": "Lead Quality",
+			"fieldtype": "Select",
+			"options": "\nHot\nWarm\nCold\nUnqualified",
+			"insert_after": "lead_score",
+			"read_only": 1
+		},
+		{
+			"fieldname": "campaign_source",
+			"label": "Campaign Source",
+			"fieldtype": "Link",
+			"options": "Lead Campaign",
+			"insert_after": "lead_quality",
+			"read_only": 1
+		},
+		{
+			"fieldname": "enrichment_data",
+			"label": "Enrichment Data",
+			"fieldtype": "Code",
+			"options": "JSON",
+			"insert_after": "campaign_source",
+			"read_only": 1,
+			"hidden": 1
+		},
+		{
+			"fieldname": "column_break_li_1",
+			"fieldtype": "Column Break",
+			"insert_after": "enrichment_data"
+		},
+		{
+			"fieldname": "ai_insights",
+			"label": "AI Insights",
+			"fieldtype": "Text Editor",
+			"insert_after": "column_break_li_1",
+			"read_only": 1
+		},
+		{
+			"fieldname": "last_enriched",
+			"label": "Last Enriched",
+			"fieldtype": "Datetime",
+			"insert_after": "ai_insights",
+			"read_only": 1
+		},
+		{
+			"fieldname": "engagement_score",
+			"label": "Engagement Score",
+			"fieldtype": "Float",
+			"insert_after": "last_enriched",
+			"read_only": 1,
+			"precision": 2
+		}
+	],
+	"Customer": [
+		{
+			"fieldname": "lead_intelligence_section",
+			"label": "Lead Intelligence",
+			"fieldtype": "Section Break",
+			"insert_after": "represents_company",
+			"collapsible": 1
+		},
+		{
+			"fieldname": "original_lead_score",
+			"label": "Original Lead Score",
+			"fieldtype": "Int",
+			"insert_after": "lead_intelligence_section",
+			"read_only": 1
+		},
+		{
+			"fieldname": "conversion_source",
+			"label": "Conversion Source",
+			"fieldtype": "Link",
+			"options": "Lead Campaign",
+			"insert_after": "original_lead_score",
+			"read_only": 1
+		}
+	],
+	"Contact": [
+		{
+			"fieldname": "lead_intelligence_section",
+			"label": "Lead Intelligence",
+			"fieldtype": "Section Break",
+			"insert_after": "sync_with_google_contacts",
+			"collapsible": 1
+		},
+		{
+			"fieldname": "contact_score",
+			"label": "Contact Score",
+			"fieldtype": "Int",
+			"insert_after": "lead_intelligence_section",
+			"read_only": 1
+		},
+		{
+			"fieldname": "social_profiles",
+			"label": "Social Profiles",
+			"fieldtype": "Code",
+			"options": "JSON",
+			"insert_after": "contact_score",
+			"read_only": 1,
+			"hidden": 1
+		}
+	]
+}
+
+
+# Email templates seeded on install
+EMAIL_TEMPLATES: Final[tuple[dict, ...]] = (
+	{
+		"name": "Lead Intelligence Welcome",
+		"subject": "Welcome to Lead Intelligence",
+		"response": """
+			<h3>Welcome to Lead Intelligence!</h3>
+			<p>Thank you for installing Lead Intelligence. Your AI-powered lead generation system is now ready to use.</p>
+			<p>To get started:</p>
+			<ol>
+				<li>Configure your API keys in Lead Intelligence Settings</li>
+				<li>Create your first Lead Campaign</li>
+				<li>Start generating high-quality leads</li>
+			</ol>
+			<p>Best regards,<br>The Lead Intelligence Team</p>
+		"""
+	},
+	{
+		"name": "Campaign Completion Notification",
+		"subject": "Campaign {{ campaign_name }} Completed",
+		"response": """
+			<h3>Campaign Completed Successfully!</h3>
+			<p>Your campaign <strong>{{ campaign_name }}</strong> has been completed.</p>
+			<p><strong>Results:</strong></p>
+			<ul>
+				<li>Total Leads Generated: {{ total_leads }}</li>
+				<li>High Quality Leads: {{ high_quality_leads }}</li>
+				<li>Completion Time: {{ completion_time }}</li>
+			</ul>
+			<p>You can view the detailed results in your Lead Intelligence dashboard.</p>
+		"""
+	},
+	{
+		"name": "Lead Quality Alert",
+		"subject": "High Quality Lead Alert - {{ lead_name }}",
+		"response": """
+			<h3>High Quality Lead Detected!</h3>
+			<p>A high-quality lead has been identified:</p>
+			<p><strong>Lead Details:</strong></p>
+			<ul>
+				<li>Name: {{ lead_name }}</li>
+				<li>Company: {{ company_name }}</li>
+				<li>Email: {{ email_id }}</li>
+				<li>Lead Score: {{ lead_score }}/100</li>
+			</ul>
+			<p>Consider prioritizing this lead for immediate follow-up.</p>
+		"""
+	},
+	{
+		"name": "API Usage Warning",
+		"subject": "API Usage Warning - {{ service_name }}",
+		"response": """
+			<h3>API Usage Warning</h3>
+			<p>Your {{ service_name }} API usage is approaching the daily limit.</p>
+			<p><strong>Current Usage:</strong> {{ current_usage }} / {{ daily_limit }}</p>
+			<p>Please monitor your usage to avoid service interruption.</p>
+			<p>Consider upgrading your plan if you need higher limits.</p>
+		"""
+	},
+	{
+		"name": "System Error Notification",
+		"subject": "Lead Intelligence System Error",
+		"response": """
+			<h3>System Error Notification</h3>
+			<p>An error has occurred in the Lead Intelligence system:</p>
+			<p><strong>Error Details:</strong></p>
+			<ul>
+				<li>Error Type: {{ error_type }}</li>
+				<li>Time: {{ error_time }}</li>
+				<li>Component: {{ component }}</li>
+			</ul>
+			<p>Please check the system logs for more details.</p>
+		"""
+	}
+)
+
+
+# Number cards for the Lead Intelligence dashboard
+NUMBER_CARDS: Final[tuple[dict, ...]] = (
+	{
+		"name": "Total Leads Generated",
+		"label": "Total Leads Generated",
+		"document_type": "Lead",
+		"function": "Count",
+		"is_public": 1,
+		"show_percentage_stats": 1,
+		"stats_time_interval": "Monthly"
+	},
+	{
+		"name": "Active Campaigns",
+		"label": "Active Campaigns",
+		"document_type": "Lead Campaign",
+		"function": "Count",
+		"filters_json": '[{"fieldname": "status", "operator": "in", "value": ["Active", "Processing"]}]',
+		"is_public": 1
+	},
+	{
+		"name": "High Quality Leads",
+		"label": "High Quality Leads",
+		"document_type": "Lead",
+		"function": "Count",
+		"filters_json": '[{"fieldname": "lead_quality", "operator": "=", "value": "Hot"}]',
+		"is_public": 1,
+		"show_percentage_stats": 1
+	},
+	{
+		"name": "Conversion Rate",
+		"label": "Lead Conversion Rate",
+		"document_type": "Lead",
+		"function": "Count",
+		"filters_json": '[{"fieldname": "status", "operator": "=", "value": "Converted"}]',
+		"is_public": 1,
+		"show_percentage_stats": 1
+	}
+)
+
+
+# Charts for the Lead Intelligence dashboard
+DASHBOARD_CHARTS: Final[tuple[dict, ...]] = (
+	{
+		"name": "Lead Generation Trends",
+		"chart_name": "Lead Generation Trends",
+		"chart_type": "Line",
+		"document_type": "Lead",
+		"based_on": "creation",
+		"value_based_on": "name",
+		"time_interval": "Daily",
+		"timespan": "Last Month",
+		"is_public": 1
+	},
+	{
+		"name": "Campaign Performance",
+		"chart_name": "Campaign Performance",
+		"chart_type": "Bar",
+		"document_type": "Lead Campaign",
+		"based_on": "status",
+		"value_based_on": "name",
+		"is_public": 1
+	},
+	{
+		"name": "Lead Quality Distribution",
+		"chart_name": "Lead Quality Distribution",
+		"chart_type": "Donut",
+		"document_type": "Lead",
+		"based_on": "lead_quality",
+		"value_based_on": "name",
+		"is_public": 1
+	},
+	{
+		"name": "Lead Source Analysis",
+		"chart_name": "Lead Source Analysis",
+		"chart_type": "Bar",
+		"document_type": "Lead",
+		"based_on": "source",
+		"value_based_on": "name",
+		"is_public": 1
+	}
+)
+
+
+# Approval workflow for Lead Campaign
+LEAD_CAMPAIGN_WORKFLOW: Final[dict] = {
+	"doctype": "Workflow",
+	"workflow_name": "Lead Campaign Workflow",
+	"document_type": "Lead Campaign",
+	"workflow_state_field": "status",
+	"is_active": 1,
+	"send_email_alert": 1,
+	"states": [
+		{
+			"state": "Draft",
+			"doc_status": "0",
+			"allow_edit": "Lead Intelligence Manager"
+		},
+		{
+			"state": "Queued",
+			"doc_status": "1",
+			"allow_edit": "Lead Intelligence Manager"
+		},
+		{
+			"state": "Processing",
+			"doc_status": "1",
+			"allow_edit": "Lead Intelligence Manager"
+		},
+		{
+			"state": "Completed",
+			"doc_status": "1",
+			"allow_edit": "Lead Intelligence Manager"
+		},
+		{
+			"state": "Failed",
+			"doc_status": "1",
+			"allow_edit": "Lead Intelligence Manager"
+		}
+	],
+	"transitions": [
+		{
+			"state": "Draft",
+			"action": "Submit",
+			"next_state": "Queued",
+			"allowed": "Lead Intelligence Manager"
+		},
+		{
+			"state": "Queued",
+			"action": "Start Processing",
+			"next_state": "Processing",
+			"allowed": "Lead Intelligence Manager"
+		},
+		{
+			"state": "Processing",
+			"action": "Complete",
+			"next_state": "Completed",
+			"allowed": "Lead Intelligence Manager"
+		},
+		{
+			"state": "Processing",
+			"action": "Mark as Failed",
+			"next_state": "Failed",
+			"allowed": "Lead Intelligence Manager"
+		}
+	]
+}
 
 
 def after_install():
 	"""Setup Lead Intelligence after installation"""
+	in_install, mute_emails = frappe.flags.in_install, frappe.flags.mute_emails
+	frappe.flags.in_install = True
+	frappe.flags.mute_emails = True
+	savepoint = None
+	
 	try:
-		# Create custom fields
+		# Create custom fields and indexes (schema changes commit implicitly,
+		# so these run before the savepoint)
 		create_lead_intelligence_custom_fields()
+		add_lead_indexes()
+		
+		# Seed the remaining records in one transaction
+		savepoint = INSTALL_SAVEPOINT
+		frappe.db.savepoint(savepoint)
 		
 		# Create custom roles
 		create_custom_roles()
@@ -32,134 +396,26 @@ def after_install():
 		print("Lead Intelligence installation completed successfully!")
 		
 	except Exception as e:
+		frappe.db.rollback(save_point=savepoint)
 		frappe.log_error(f"Installation error: {str(e)}", "Lead Intelligence Installation")
 		print(f"Installation error: {str(e)}")
+	
+	finally:
+		frappe.flags.in_install = in_install
+		frappe.flags.mute_emails = mute_emails
 
 
 def create_lead_intelligence_custom_fields():
 	"""Create custom fields for Lead Intelligence"""
-	custom_fields = {
-		"Lead": [
-			{
-				"fieldname": "lead_intelligence_section",
-				"label": "Lead Intelligence",
-				"fieldtype": "Section Break",
-				"insert_after": "source",
-				"collapsible": 1
-			},
-			{
-				"fieldname": "lead_score",
-				"label": "Lead Score",
-				"fieldtype": "Int",
-				"insert_after": "lead_intelligence_section",
-				"read_only": 1,
-				"description": "AI-calculated lead quality score (0-100)"
-			},
-			{
-				"fieldname": "lead_quality",
-				"label": "Lead Quality",
-				"fieldtype": "Select",
-				"options": "\nHot\nWarm\nCold\nUnqualified",
-				"insert_after": "lead_score",
-				"read_only": 1
-			},
-			{
-				"fieldname": "campaign_source",
-				"label": "Campaign Source",
-				"fieldtype": "Link",
-				"options": "Lead Campaign",
-				"insert_after": "lead_quality",
-				"read_only": 1
-			},
-			{
-				"fieldname": "enrichment_data",
-				"label": "Enrichment Data",
-				"fieldtype": "Code",
-				"options": "JSON",
-				"insert_after": "campaign_source",
-				"read_only": 1,
-				"hidden": 1
-			},
-			{
-				"fieldname": "column_break_li_1",
-				"fieldtype": "Column Break",
-				"insert_after": "enrichment_data"
-			},
-			{
-				"fieldname": "ai_insights",
-				"label": "AI Insights",
-				"fieldtype": "Text Editor",
-				"insert_after": "column_break_li_1",
-				"read_only": 1
-			},
-			{
-				"fieldname": "last_enriched",
-				"label": "Last Enriched",
-				"fieldtype": "Datetime",
-				"insert_after": "ai_insights",
-				"read_only": 1
-			},
-			{
-				"fieldname": "engagement_score",
-				"label": "Engagement Score",
-				"fieldtype": "Float",
-				"insert_after": "last_enriched",
-				"read_only": 1,
-				"precision": 2
-			}
-		],
-		"Customer": [
-			{
-				"fieldname": "lead_intelligence_section",
-				"label": "Lead Intelligence",
-				"fieldtype": "Section Break",
-				"insert_after": "represents_company",
-				"collapsible": 1
-			},
-			{
-				"fieldname": "original_lead_score",
-				"label": "Original Lead Score",
-				"fieldtype": "Int",
-				"insert_after": "lead_intelligence_section",
-				"read_only": 1
-			},
-			{
-				"fieldname": "conversion_source",
-				"label": "Conversion Source",
-				"fieldtype": "Link",
-				"options": "Lead Campaign",
-				"insert_after": "original_lead_score",
-				"read_only": 1
-			}
-		],
-		"Contact": [
-			{
-				"fieldname": "lead_intelligence_section",
-				"label": "Lead Intelligence",
-				"fieldtype": "Section Break",
-				"insert_after": "sync_with_google_contacts",
-				"collapsible": 1
-			},
-			{
-				"fieldname": "contact_score",
-				"label": "Contact Score",
-				"fieldtype": "Int",
-				"insert_after": "lead_intelligence_section",
-				"read_only": 1
-			},
-			{
-				"fieldname": "social_profiles",
-				"label": "Social Profiles",
-				"fieldtype": "Code",
-				"options": "JSON",
-				"insert_after": "contact_score",
-				"read_only": 1,
-				"hidden": 1
-			}
-		]
-	}
-	
-	create_custom_fields(custom_fields)
+	# One combined call so Frappe defers the per-DocType on_update/clear_cache
+	# work until all fields are in place
+	create_custom_fields(CUSTOM_FIELDS, ignore_validate=True, update=True)
+
+
+def add_lead_indexes():
+	"""Index the Lead columns the scheduled tasks filter on"""
+	# archive_old_leads filters on creation and status
+	frappe.db.add_index("Lead", ["creation", "status"])
 
 
 def create_custom_roles():
@@ -177,15 +433,21 @@ def create_custom_roles():
 		}
 	]
 	
-	for role_data in roles:
-		if not frappe.db.exists("Role", role_data["role_name"]):
-			role = frappe.get_doc({
-				"doctype": "Role",
+	by_name = {role_data["role_name"]: role_data for role_data in roles}
+	
+	def new_roles():
+		for name in _missing("Role", by_name):
+			role_data = by_name[name]
+			role = frappe.new_doc("Role")
+			role.update({
+				"name": role_data["role_name"],
 				"role_name": role_data["role_name"],
 				"desk_access": role_data["desk_access"],
 				"home_page": role_data.get("home_page")
 			})
-			role.insert(ignore_permissions=True)
+			yield role
+	
+	_bulk_insert("Role", new_roles())
 
 
 def setup_default_settings():
@@ -208,158 +470,28 @@ def setup_default_settings():
 
 def create_email_templates():
 	"""Create default email templates"""
-	templates = [
-		{
-			"name": "Lead Intelligence Welcome",
-			"subject": "Welcome to Lead Intelligence",
-			"response": """
-				<h3>Welcome to Lead Intelligence!</h3>
-				<p>Thank you for installing Lead Intelligence. Your AI-powered lead generation system is now ready to use.</p>
-				<p>To get started:</p>
-				<ol>
-					<li>Configure your API keys in Lead Intelligence Settings</li>
-					<li>Create your first Lead Campaign</li>
-					<li>Start generating high-quality leads</li>
-				</ol>
-				<p>Best regards,<br>The Lead Intelligence Team</p>
-			"""
-		},
-		{
-			"name": "Campaign Completion Notification",
-			"subject": "Campaign {{ campaign_name }} Completed",
-			"response": """
-				<h3>Campaign Completed Successfully!</h3>
-				<p>Your campaign <strong>{{ campaign_name }}</strong> has been completed.</p>
-				<p><strong>Results:</strong></p>
-				<ul>
-					<li>Total Leads Generated: {{ total_leads }}</li>
-					<li>High Quality Leads: {{ high_quality_leads }}</li>
-					<li>Completion Time: {{ completion_time }}</li>
-				</ul>
-				<p>You can view the detailed results in your Lead Intelligence dashboard.</p>
-			"""
-		},
-		{
-			"name": "Lead Quality Alert",
-			"subject": "High Quality Lead Alert - {{ lead_name }}",
-			"response": """
-				<h3>High Quality Lead Detected!</h3>
-				<p>A high-quality lead has been identified:</p>
-				<p><strong>Lead Details:</strong></p>
-				<ul>
-					<li>Name: {{ lead_name }}</li>
-					<li>Company: {{ company_name }}</li>
-					<li>Email: {{ email_id }}</li>
-					<li>Lead Score: {{ lead_score }}/100</li>
-				</ul>
-				<p>Consider prioritizing this lead for immediate follow-up.</p>
-			"""
-		},
-		{
-			"name": "API Usage Warning",
-			"subject": "API Usage Warning - {{ service_name }}",
-			"response": """
-				<h3>API Usage Warning</h3>
-				<p>Your {{ service_name }} API usage is approaching the daily limit.</p>
-				<p><strong>Current Usage:</strong> {{ current_usage }} / {{ daily_limit }}</p>
-				<p>Please monitor your usage to avoid service interruption.</p>
-				<p>Consider upgrading your plan if you need higher limits.</p>
-			"""
-		},
-		{
-			"name": "System Error Notification",
-			"subject": "Lead Intelligence System Error",
-			"response": """
-				<h3>System Error Notification</h3>
-				<p>An error has occurred in the Lead Intelligence system:</p>
-				<p><strong>Error Details:</strong></p>
-				<ul>
-					<li>Error Type: {{ error_type }}</li>
-					<li>Time: {{ error_time }}</li>
-					<li>Component: {{ component }}</li>
-				</ul>
-				<p>Please check the system logs for more details.</p>
-			"""
-		}
-	]
+	by_name = {template_data["name"]: template_data for template_data in EMAIL_TEMPLATES}
 	
-	for template_data in templates:
-		if not frappe.db.exists("Email Template", template_data["name"]):
-			template = frappe.get_doc({
-				"doctype": "Email Template",
+	def new_templates():
+		for name in _missing("Email Template", by_name):
+			template_data = by_name[name]
+			template = frappe.new_doc("Email Template")
+			template.update({
 				"name": template_data["name"],
 				"subject": template_data["subject"],
 				"response": template_data["response"],
 				"use_html": 1
 			})
-			template.insert(ignore_permissions=True)
+			yield template
+	
+	_bulk_insert("Email Template", new_templates())
 
 
 def setup_workflows():
 	"""Setup workflows for Lead Intelligence"""
 	# Lead Campaign Workflow
 	if not frappe.db.exists("Workflow", "Lead Campaign Workflow"):
-		workflow = frappe.get_doc({
-			"doctype": "Workflow",
-			"workflow_name": "Lead Campaign Workflow",
-			"document_type": "Lead Campaign",
-			"workflow_state_field": "status",
-			"is_active": 1,
-			"send_email_alert": 1,
-			"states": [
-				{
-					"state": "Draft",
-					"doc_status": "0",
-					"allow_edit": "Lead Intelligence Manager"
-				},
-				{
-					"state": "Queued",
-					"doc_status": "1",
-					"allow_edit": "Lead Intelligence Manager"
-				},
-				{
-					"state": "Processing",
-					"doc_status": "1",
-					"allow_edit": "Lead Intelligence Manager"
-				},
-				{
-					"state": "Completed",
-					"doc_status": "1",
-					"allow_edit": "Lead Intelligence Manager"
-				},
-				{
-					"state": "Failed",
-					"doc_status": "1",
-					"allow_edit": "Lead Intelligence Manager"
-				}
-			],
-			"transitions": [
-				{
-					"state": "Draft",
-					"action": "Submit",
-					"next_state": "Queued",
-					"allowed": "Lead Intelligence Manager"
-				},
-				{
-					"state": "Queued",
-					"action": "Start Processing",
-					"next_state": "Processing",
-					"allowed": "Lead Intelligence Manager"
-				},
-				{
-					"state": "Processing",
-					"action": "Complete",
-					"next_state": "Completed",
-					"allowed": "Lead Intelligence Manager"
-				},
-				{
-					"state": "Processing",
-					"action": "Mark as Failed",
-					"next_state": "Failed",
-					"allowed": "Lead Intelligence Manager"
-				}
-			]
-		})
+		workflow = frappe.get_doc(copy.deepcopy(LEAD_CAMPAIGN_WORKFLOW))
 		workflow.insert(ignore_permissions=True)
 
 
@@ -446,100 +578,57 @@ def create_workspace():
 
 def setup_number_cards():
 	"""Setup number cards for dashboard"""
-	number_cards = [
-		{
-			"name": "Total Leads Generated",
-			"label": "Total Leads Generated",
-			"document_type": "Lead",
-			"function": "Count",
-			"is_public": 1,
-			"show_percentage_stats": 1,
-			"stats_time_interval": "Monthly"
-		},
-		{
-			"name": "Active Campaigns",
-			"label": "Active Campaigns",
-			"document_type": "Lead Campaign",
-			"function": "Count",
-			"filters_json": '[{"fieldname": "status", "operator": "in", "value": ["Active", "Processing"]}]',
-			"is_public": 1
-		},
-		{
-			"name": "High Quality Leads",
-			"label": "High Quality Leads",
-			"document_type": "Lead",
-			"function": "Count",
-			"filters_json": '[{"fieldname": "lead_quality", "operator": "=", "value": "Hot"}]',
-			"is_public": 1,
-			"show_percentage_stats": 1
-		},
-		{
-			"name": "Conversion Rate",
-			"label": "Lead Conversion Rate",
-			"document_type": "Lead",
-			"function": "Count",
-			"filters_json": '[{"fieldname": "status", "operator": "=", "value": "Converted"}]',
-			"is_public": 1,
-			"show_percentage_stats": 1
-		}
-	]
+	by_name = {card_data["name"]: card_data for card_data in NUMBER_CARDS}
 	
-	for card_data in number_cards:
-		if not frappe.db.exists("Number Card", card_data["name"]):
-			card = frappe.get_doc({
-				"doctype": "Number Card",
-				**card_data
-			})
-			card.insert(ignore_permissions=True)
+	def new_cards():
+		for name in _missing("Number Card", by_name):
+			card_data = by_name[name]
+			card = frappe.new_doc("Number Card")
+			card.update(card_data)
+			yield card
+	
+	_bulk_insert("Number Card", new_cards())
 
 
 def create_dashboard_charts():
 	"""Create dashboard charts"""
-	charts = [
-		{
-			"name": "Lead Generation Trends",
-			"chart_name": "Lead Generation Trends",
-			"chart_type": "Line",
-			"document_type": "Lead",
-			"based_on": "creation",
-			"value_based_on": "name",
-			"time_interval": "Daily",
-			"timespan": "Last Month",
-			"is_public": 1
-		},
-		{
-			"name": "Campaign Performance",
-			"chart_name": "Campaign Performance",
-			"chart_type": "Bar",
-			"document_type": "Lead Campaign",
-			"based_on": "status",
-			"value_based_on": "name",
-			"is_public": 1
-		},
-		{
-			"name": "Lead Quality Distribution",
-			"chart_name": "Lead Quality Distribution",
-			"chart_type": "Donut",
-			"document_type": "Lead",
-			"based_on": "lead_quality",
-			"value_based_on": "name",
-			"is_public": 1
-		},
-		{
-			"name": "Lead Source Analysis",
-			"chart_name": "Lead Source Analysis",
-			"chart_type": "Bar",
-			"document_type": "Lead",
-			"based_on": "source",
-			"value_based_on": "name",
-			"is_public": 1
-		}
-	]
+	by_name = {chart_data["name"]: chart_data for chart_data in DASHBOARD_CHARTS}
 	
-	for chart_data in charts:
-		if not frappe.db.exists("Dashboard Chart", chart_data["name"]):
-			chart = frappe.get_doc({
-				"doctype": "Dashboard Chart",
-				**chart_data
-			})
-			chart.insert(ignore_permissions=True)
\ No newline at end of file
+	def new_charts():
+		for name in _missing("Dashboard Chart", by_name):
+			chart_data = by_name[name]
+			chart = frappe.new_doc("Dashboard Chart")
+			chart.update(chart_data)
+			yield chart
+	
+	_bulk_insert("Dashboard Chart", new_charts())
+
+
+def _missing(doctype, names):
+	"""Return the given names that do not exist yet, in one query"""
+	names = list(names)
+	existing = set(frappe.get_all(doctype, filters={"name": ["in", names]}, pluck="name"))
+	return [name for name in names if name not in existing]
+
+
+def _bulk_insert(doctype, docs, chunk_size=1000):
+	"""Insert seed documents in bulk, skipping controller hooks"""
+	try:
+		from frappe.model.document import bulk_insert
+	except ImportError:
+		# Older Frappe versions without bulk_insert
+		for doc in docs:
+			doc.insert(ignore_permissions=True)
+		return
+	
+	bulk_insert(doctype, _stamp_new_docs(docs), chunk_size=chunk_size)
+	frappe.clear_cache(doctype=doctype)
+
+
+def _stamp_new_docs(docs):
+	"""Fill the standard columns insert() would normally set"""
+	timestamp = now()
+	for doc in docs:
+		doc.creation = doc.modified = timestamp
+		doc.owner = doc.modified_by = frappe.session.user
+		yield doc
\ No newline at end of file
@@ -202,16 +202,13 @@ def pause_campaign(campaign_id: str) -> Dict[str, Any]:
         campaign.status = 'Paused'
         campaign.save(ignore_permissions=True)
         
-        # Pause any running executions
-        running_executions = frappe.get_all('Campaign Execution', {
+        # Pause any running executions in a single UPDATE
+        frappe.db.set_value('Campaign Execution', {
             'lead_campaign': campaign_id,
             'status': 'Running'
-        })
+        }, 'status', 'Paused')
         
-        for execution in running_executions:
-            execution_doc = frappe.get_doc('Campaign Execution', execution.name)
-            execution_doc.status = 'Paused'
-            execution_doc.save(ignore_permissions=True)
+        frappe.db.commit()
         
         return {
             'success': True,
@@ -219,6 +216,7 @@ def pause_campaign(campaign_id: str) -> Dict[str, Any]:
         }
         
     except Exception as e:
+        frappe.db.rollback()
         frappe.log_error(f"Campaign pause failed: {str(e)}", "Campaign Management Error")
         return {
             'success': False,
@@ -248,17 +246,16 @@ def complete_campaign(campaign_id: str) -> Dict[str, Any]:
         campaign.actual_end_date = now()
         campaign.save(ignore_permissions=True)
         
-        # Complete any running executions
-        running_executions = frappe.get_all('Campaign Execution', {
+        # Complete any running executions in a single UPDATE
+        frappe.db.set_value('Campaign Execution', {
             'lead_campaign': campaign_id,
             'status': ['in', ['Running', 'Paused']]
+        }, {
+            'status': 'Completed',
+            'completed_at': now()
         })
         
-        for execution in running_executions:
-            execution_doc = frappe.get_doc('Campaign Execution', execution.name)
-            execution_doc.status = 'Completed'
-            execution_doc.completed_at = now()
-            execution_doc.save(ignore_permissions=True)
+        frappe.db.commit()
         
         return {
             'success': True,
@@ -266,6 +263,7 @@ def complete_campaign(campaign_id: str) -> Dict[str, Any]:
         }
         
     except Exception as e:
+        frappe.db.rollback()
         frappe.log_error(f"Campaign completion failed: {str(e)}", "Campaign Management Error")
         return {
             'success': False,
@@ -491,12 +489,15 @@ def delete_campaign(campaign_id: str) -> Dict[str, Any]:
         # Delete campaign
         frappe.delete_doc('Lead Campaign', campaign_id, ignore_permissions=True)
         
+        frappe.db.commit()
+        
         return {
             'success': True,
             'message': _("Campaign deleted successfully")
         }
         
     except Exception as e:
+        frappe.db.rollback()
         frappe.log_error(f"Campaign deletion failed: {str(e)}", "Campaign Management Error")
         return {
             'success': False,
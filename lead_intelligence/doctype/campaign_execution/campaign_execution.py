@@ -3,11 +3,24 @@
 
 import frappe
 import json
+import time
+from contextlib import contextmanager
 from frappe.model.document import Document
-from frappe.utils import now, get_datetime, time_diff_in_seconds, add_days
+from frappe.utils import now, now_datetime, get_datetime, time_diff_in_seconds, add_days, cint, flt
 from datetime import datetime, timedelta
 
+# Maximum seconds counter updates may stay unflushed while batching
+FLUSH_INTERVAL = 2.0
+
 class CampaignExecution(Document):
+    # Counter fields changed since the last flush, written in one UPDATE
+    _pending = None
+    # (timestamp, message) log entries not yet appended to execution_log
+    _log_buffer = None
+    _pending_updates = 0
+    _batch_size = 1
+    _last_flush = 0.0
+
     def before_insert(self):
         """Set default values before insertion"""
         self.started_by = frappe.session.user
@@ -18,12 +31,17 @@ class CampaignExecution(Document):
         if self.status == 'Running' and not self.started_at:
             self.started_at = now()
             
+    def before_save(self):
+        """Write buffered log entries onto the document"""
+        self._flush_log()
+            
     def start_execution(self):
         """Start the campaign execution"""
         self.status = 'Running'
         self.started_at = now()
         self.log_message("Campaign execution started")
         self.save(ignore_permissions=True)
+        self._reset_pending()
         
     def complete_execution(self, success=True):
         """Complete the campaign execution"""
@@ -33,13 +51,13 @@ class CampaignExecution(Document):
         # Calculate execution duration
         if self.started_at:
             duration_seconds = time_diff_in_seconds(self.completed_at, self.started_at)
-            hours = duration_seconds // 3600
-            minutes = (duration_seconds % 3600) // 60
-            seconds = duration_seconds % 60
-            self.execution_duration = f"{int(hours):02d}:{int(minutes):02d}:{int(seconds):02d}"
+            hours, remainder = divmod(int(duration_seconds), 3600)
+            minutes, seconds = divmod(remainder, 60)
+            self.execution_duration = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
             
         self.log_message(f"Campaign execution {self.status.lower()}")
         self.save(ignore_permissions=True)
+        self._reset_pending()
         
     def cancel_execution(self, reason="Cancelled by user"):
         """Cancel the campaign execution"""
@@ -47,16 +65,32 @@ class CampaignExecution(Document):
         self.completed_at = now()
         self.log_message(f"Campaign execution cancelled: {reason}")
         self.save(ignore_permissions=True)
+        self._reset_pending()
         
     def log_message(self, message):
         """Add message to execution log"""
-        timestamp = now()
-        log_entry = f"[{timestamp}] {message}\n"
+        if frappe.conf.get("suppress_execution_log"):
+            return
+            
+        if self._log_buffer is None:
+            self._log_buffer = []
+        self._log_buffer.append((time.time(), message))
         
-        if self.execution_log:
-            self.execution_log += log_entry
-        else:
-            self.execution_log = log_entry
+    def _flush_log(self):
+        """Move buffered entries onto execution_log and return the appended text"""
+        if not self._log_buffer:
+            return ""
+            
+        # Format all timestamps in one pass, anchored to the system timezone clock
+        reference = now_datetime()
+        reference_ts = time.time()
+        entries = "".join(
+            f"[{(reference - timedelta(seconds=reference_ts - ts)).strftime('%Y-%m-%d %H:%M:%S')}] {message}\n"
+            for ts, message in self._log_buffer
+        )
+        self.execution_log = (self.execution_log or "") + entries
+        self._log_buffer.clear()
+        return entries
             
     def update_progress(self, processed=0, emails_sent=0, emails_failed=0, leads_created=0):
         """Update execution progress"""
@@ -70,7 +104,7 @@ class CampaignExecution(Document):
             progress = (self.processed_leads / self.target_leads) * 100
             self.log_message(f"Progress: {progress:.1f}% ({self.processed_leads}/{self.target_leads})")
             
-        self.save(ignore_permissions=True)
+        self._queue_update('processed_leads', 'emails_sent', 'emails_failed', 'leads_created')
         
     def update_ai_usage(self, requests=0, tokens=0, cost=0.0):
         """Update AI usage statistics"""
@@ -82,7 +116,7 @@ class CampaignExecution(Document):
         if self.ai_requests_made > 0 and self.emails_sent > 0:
             self.personalization_success_rate = (self.emails_sent / self.ai_requests_made) * 100
             
-        self.save(ignore_permissions=True)
+        self._queue_update('ai_requests_made', 'ai_tokens_used', 'ai_cost_incurred', 'personalization_success_rate')
         
     def update_performance_metrics(self, delivered=0, opened=0, clicked=0, responses=0):
         """Update performance metrics"""
@@ -91,10 +125,62 @@ class CampaignExecution(Document):
         self.emails_clicked = (self.emails_clicked or 0) + clicked
         self.responses_received = (self.responses_received or 0) + responses
         
-        self.save(ignore_permissions=True)
+        self._queue_update('emails_delivered', 'emails_opened', 'emails_clicked', 'responses_received')
+        
+    @contextmanager
+    def batched_updates(self, batch_size=100):
+        """Accumulate counter updates and flush them every batch_size calls or FLUSH_INTERVAL seconds"""
+        previous_batch_size = self._batch_size
+        self._batch_size = batch_size
+        self._last_flush = time.monotonic()
+        try:
+            yield self
+        finally:
+            self._batch_size = previous_batch_size
+            self.flush_updates()
+            
+    def flush_updates(self):
+        """Write all pending counter changes in a single UPDATE"""
+        if self._pending:
+            frappe.db.set_value('Campaign Execution', self.name, self._pending, update_modified=False)
+            
+        log_entries = self._flush_log()
+        if log_entries:
+            # Append in the database instead of rewriting the whole log column
+            frappe.db.sql("""
+                UPDATE `tabCampaign Execution`
+                SET execution_log = CONCAT(COALESCE(execution_log, ''), %s)
+                WHERE name = %s
+            """, (log_entries, self.name))
+            
+        self._reset_pending()
+        
+    def _queue_update(self, *fieldnames):
+        """Mark fields as changed and flush if the batch is full"""
+        if self._pending is None:
+            self._pending = {}
+        for fieldname in fieldnames:
+            self._pending[fieldname] = self.get(fieldname)
+            
+        self._pending_updates += 1
+        if (self._pending_updates >= self._batch_size
+                or time.monotonic() - self._last_flush > FLUSH_INTERVAL):
+            self.flush_updates()
+            
+    def _reset_pending(self):
+        """Forget pending changes once they have been persisted"""
+        self._pending = {}
+        self._pending_updates = 0
+        self._last_flush = time.monotonic()
         
     def get_execution_summary(self):
         """Get execution summary"""
+        sent = self.emails_sent or 0
+        delivered = self.emails_delivered or 0
+        opened = self.emails_opened or 0
+        clicked = self.emails_clicked or 0
+        responses = self.responses_received or 0
+        
         summary = {
             'execution_id': self.name,
             'campaign': self.lead_campaign,
@@ -106,12 +192,12 @@ class CampaignExecution(Document):
                 'target_leads': self.target_leads or 0,
                 'processed_leads': self.processed_leads or 0,
                 'leads_created': self.leads_created or 0,
-                'emails_sent': self.emails_sent or 0,
+                'emails_sent': sent,
                 'emails_failed': self.emails_failed or 0,
-                'emails_delivered': self.emails_delivered or 0,
-                'emails_opened': self.emails_opened or 0,
-                'emails_clicked': self.emails_clicked or 0,
-                'responses_received': self.responses_received or 0
+                'emails_delivered': delivered,
+                'emails_opened': opened,
+                'emails_clicked': clicked,
+                'responses_received': responses
             },
             'ai_usage': {
                 'requests_made': self.ai_requests_made or 0,
@@ -122,12 +208,12 @@ class CampaignExecution(Document):
         }
         
         # Calculate rates
-        if self.emails_sent > 0:
+        if sent > 0:
             summary['rates'] = {
-                'delivery_rate': (self.emails_delivered / self.emails_sent) * 100 if self.emails_delivered else 0,
-                'open_rate': (self.emails_opened / self.emails_delivered) * 100 if self.emails_delivered and self.emails_opened else 0,
-                'click_rate': (self.emails_clicked / self.emails_opened) * 100 if self.emails_opened and self.emails_clicked else 0,
-                'response_rate': (self.responses_received / self.emails_delivered) * 100 if self.emails_delivered and self.responses_received else 0
+                'delivery_rate': (delivered / sent) * 100,
+                'open_rate': (opened / delivered) * 100 if delivered else 0,
+                'click_rate': (clicked / opened) * 100 if opened else 0,
+                'response_rate': (responses / delivered) * 100 if delivered else 0
             }
         else:
             summary['rates'] = {
@@ -186,72 +272,89 @@ def get_execution_analytics(days=30, campaign=None):
     """Get execution analytics for specified period"""
     from_date = add_days(get_datetime(), -int(days))
     
-    filters = {
-        'started_at': ['>=', from_date]
-    }
-    
+    filters = {'started_at': ['>=', from_date]}
     if campaign:
         filters['lead_campaign'] = campaign
         
-    executions = frappe.get_list(
+    # Aggregate per status in the database, get_list applies the user's permissions
+    status_rows = frappe.get_list(
         'Campaign Execution',
         filters=filters,
         fields=[
-            'name', 'lead_campaign', 'status', 'started_at', 'completed_at',
-            'target_leads', 'processed_leads', 'emails_sent', 'emails_failed',
-            'leads_created', 'ai_requests_made', 'ai_tokens_used', 'ai_cost_incurred',
-            'emails_delivered', 'emails_opened', 'emails_clicked', 'responses_received'
-        ]
+            'status',
+            'count(name) as executions',
+            'sum(processed_leads) as leads_processed',
+            'sum(emails_sent) as emails_sent',
+            'sum(leads_created) as leads_created',
+            'sum(ai_cost_incurred) as ai_cost',
+            'sum(emails_delivered) as emails_delivered',
+            'sum(emails_opened) as emails_opened',
+            'sum(emails_clicked) as emails_clicked',
+            'sum(responses_received) as responses_received'
+        ],
+        group_by='status',
+        order_by='status asc'
+    )
+    
+    # Aggregate per day for trend analysis
+    daily_rows = frappe.get_list(
+        'Campaign Execution',
+        filters=filters,
+        fields=[
+            'date(started_at) as date',
+            'count(name) as executions',
+            'sum(processed_leads) as leads_processed',
+            'sum(emails_sent) as emails_sent'
+        ],
+        group_by='date(started_at)',
+        order_by='date(started_at) asc'
     )
     
-    # Calculate summary statistics
-    total_executions = len(executions)
-    completed_executions = len([e for e in executions if e.status == 'Completed'])
-    failed_executions = len([e for e in executions if e.status == 'Failed'])
+    # Calculate summary statistics in a single pass
+    status_data = {}
+    total_executions = 0
+    total_leads_processed = 0
+    total_emails_sent = 0
+    total_leads_created = 0
+    total_ai_cost = 0.0
+    total_delivered = 0
+    total_opened = 0
+    total_clicked = 0
+    total_responses = 0
     
-    total_leads_processed = sum(e.processed_leads or 0 for e in executions)
-    total_emails_sent = sum(e.emails_sent or 0 for e in executions)
-    total_leads_created = sum(e.leads_created or 0 for e in executions)
-    total_ai_cost = sum(e.ai_cost_incurred or 0 for e in executions)
+    for row in status_rows:
+        status_data[row.status] = row.executions
+        total_executions += row.executions
+        total_leads_processed += cint(row.leads_processed)
+        total_emails_sent += cint(row.emails_sent)
+        total_leads_created += cint(row.leads_created)
+        total_ai_cost += flt(row.ai_cost)
+        total_delivered += cint(row.emails_delivered)
+        total_opened += cint(row.emails_opened)
+        total_clicked += cint(row.emails_clicked)
+        total_responses += cint(row.responses_received)
+        
+    completed_executions = status_data.get('Completed', 0)
+    failed_executions = status_data.get('Failed', 0)
     
     # Calculate rates
     success_rate = (completed_executions / total_executions * 100) if total_executions > 0 else 0
     
-    total_delivered = sum(e.emails_delivered or 0 for e in executions)
-    total_opened = sum(e.emails_opened or 0 for e in executions)
-    total_clicked = sum(e.emails_clicked or 0 for e in executions)
-    total_responses = sum(e.responses_received or 0 for e in executions)
-    
     delivery_rate = (total_delivered / total_emails_sent * 100) if total_emails_sent > 0 else 0
     open_rate = (total_opened / total_delivered * 100) if total_delivered > 0 else 0
     click_rate = (total_clicked / total_opened * 100) if total_opened > 0 else 0
     response_rate = (total_responses / total_delivered * 100) if total_delivered > 0 else 0
     
-    # Group by status for chart data
-    status_data = {}
-    for execution in executions:
-        status = execution.status
-        if status not in status_data:
-            status_data[status] = 0
-        status_data[status] += 1
-        
-    # Group by date for trend analysis
-    daily_data = {}
-    for execution in executions:
-        date = execution.started_at.date() if execution.started_at else None
-        if date:
-            date_str = date.strftime('%Y-%m-%d')
-            if date_str not in daily_data:
-                daily_data[date_str] = {
-                    'executions': 0,
-                    'leads_processed': 0,
-                    'emails_sent': 0
-                }
-            daily_data[date_str]['executions'] += 1
-            daily_data[date_str]['leads_processed'] += execution.processed_leads or 0
-            daily_data[date_str]['emails_sent'] += execution.emails_sent or 0
+    daily_data = {
+        row.date.strftime('%Y-%m-%d'): {
+            'executions': row.executions,
+            'leads_processed': cint(row.leads_processed),
+            'emails_sent': cint(row.emails_sent)
+        }
+        for row in daily_rows
+    }
             
-    return {
+    analytics = {
         'summary': {
             'total_executions': total_executions,
             'completed_executions': completed_executions,
@@ -266,62 +369,74 @@ def get_execution_analytics(days=30, campaign=None):
             'click_rate': click_rate,
             'response_rate': response_rate
         },
-        'executions': executions,
         'status_distribution': status_data,
         'daily_trends': daily_data
     }
+    
+    # A single campaign's window is small, so return its rows as well
+    if campaign:
+        analytics['executions'] = frappe.get_list(
+            'Campaign Execution',
+            filters={
+                'started_at': ['>=', from_date],
+                'lead_campaign': campaign
+            },
+            fields=[
+                'name', 'lead_campaign', 'status', 'started_at', 'completed_at',
+                'target_leads', 'processed_leads', 'emails_sent', 'emails_failed',
+                'leads_created', 'ai_cost_incurred'
+            ],
+            order_by='started_at desc'
+        )
+        
+    return analytics
 
 @frappe.whitelist()
 def get_running_executions():
     """Get currently running executions"""
-    running_executions = frappe.get_list(
-        'Campaign Execution',
-        filters={'status': ['in', ['Running', 'Queued']]},
-        fields=[
-            'name', 'lead_campaign', 'status', 'started_at',
-            'target_leads', 'processed_leads', 'emails_sent'
-        ],
-        order_by='started_at desc'
-    )
+    frappe.has_permission('Campaign Execution', 'read', throw=True)
     
-    # Add progress percentage
-    for execution in running_executions:
-        if execution.target_leads and execution.target_leads > 0:
-            execution.progress = (execution.processed_leads or 0) / execution.target_leads * 100
-        else:
-            execution.progress = 0
-            
-    return running_executions
+    # Progress percentage is computed in the query
+    return frappe.db.sql("""
+        SELECT name, lead_campaign, status, started_at,
+            target_leads, processed_leads, emails_sent,
+            CASE WHEN target_leads > 0
+                THEN COALESCE(processed_leads, 0) / target_leads * 100
+                ELSE 0
+            END AS progress
+        FROM `tabCampaign Execution`
+        WHERE status IN ('Running', 'Queued')
+        ORDER BY started_at DESC
+    """, as_dict=True)
 
 @frappe.whitelist()
 def retry_failed_execution(execution_id):
     """Retry a failed execution"""
-    original_execution = frappe.get_doc('Campaign Execution', execution_id)
+    original_execution = frappe.db.get_value(
+        'Campaign Execution',
+        execution_id,
+        ['status', 'naming_series', 'lead_campaign', 'execution_type', 'target_leads'],
+        as_dict=True
+    )
     
-    if original_execution.status != 'Failed':
+    if not original_execution:
+        frappe.throw(f"Campaign Execution {execution_id} not found")
+        
+    if original_execution.pop('status') != 'Failed':
         frappe.throw("Can only retry failed executions")
         
-    # Create new execution
-    new_execution = frappe.copy_doc(original_execution)
-    new_execution.status = 'Queued'
-    new_execution.started_at = None
-    new_execution.completed_at = None
-    new_execution.execution_duration = None
-    new_execution.execution_log = None
-    new_execution.error_details = None
-    
-    # Reset statistics
-    new_execution.processed_leads = 0
-    new_execution.emails_sent = 0
-    new_execution.emails_failed = 0
-    new_execution.leads_created = 0
-    new_execution.ai_requests_made = 0
-    new_execution.ai_tokens_used = 0
-    new_execution.ai_cost_incurred = 0
-    new_execution.emails_delivered = 0
-    new_execution.emails_opened = 0
-    new_execution.emails_clicked = 0
-    new_execution.responses_received = 0
+    # Create new execution carrying over only the configuration fields,
+    # logs and statistics start fresh
+    new_execution = frappe.get_doc({
+        'doctype': 'Campaign Execution',
+        'status': 'Queued',
+        **original_execution
+    })
     
     new_execution.insert()
-    return new_execution.name
\ No newline at end of file
+    return new_execution.name
+
+
+def on_doctype_update():
+    """Index the per-campaign status lookups used by the scheduler"""
+    frappe.db.add_index("Campaign Execution", ["lead_campaign", "status"])
@@ -4,88 +4,119 @@
 import frappe
 from frappe import _
 from frappe.model.document import Document
+from frappe.model.naming import make_autoname
 from frappe.utils import nowdate, now, flt, cint, get_datetime
 from datetime import datetime, timedelta
+import functools
 import json
+import threading
 from typing import Dict, Any, Optional, List
 
+USAGE_STATS_NAMING_SERIES = "LI-USAGE-.YYYY.-.MM.-.DD.-.#####"
+
 class LeadIntelligenceUsageStats(Document):
 	"""Lead Intelligence Usage Statistics DocType for tracking API usage and system metrics."""
 	
+	# Service name -> (calls field, cost field)
+	_SERVICE_FIELDS = {
+		"google_places": ("google_places_calls", "google_places_cost"),
+		"openai": ("openai_calls", "openai_cost"),
+		"email": ("email_api_calls", "email_service_cost"),
+		"crm": ("crm_api_calls", "crm_integration_cost"),
+		"data_enrichment": ("data_enrichment_calls", "data_enrichment_cost"),
+		"webhook": ("webhook_calls", None)
+	}
+	
+	# Metric name -> counter field
+	_METRIC_FIELDS = {
+		"leads_generated": "leads_generated",
+		"emails_sent": "emails_sent",
+		"campaigns_created": "campaigns_created",
+		"ai_conversations": "ai_conversations",
+		"lead_analyses": "lead_analyses",
+		"email_generations": "email_generations"
+	}
+	
+	_COUNTER_FIELDS = (
+		"google_places_calls", "openai_calls", "email_api_calls", "crm_api_calls",
+		"data_enrichment_calls", "webhook_calls", "google_places_cost", "openai_cost",
+		"email_service_cost", "crm_integration_cost", "data_enrichment_cost",
+		"leads_generated", "emails_sent", "campaigns_created", "ai_conversations",
+		"lead_analyses", "email_generations", "total_requests", "error_count",
+		"bandwidth_used", "response_time_sum", "response_time_samples"
+	)
+	
+	# Parsed metadata, serialised back to JSON once in before_save
+	_meta_dict = None
+	_meta_dirty = False
+	
+	def before_insert(self):
+		"""Initialise counters so increments never need cint()/flt() coercion."""
+		for fieldname in self._COUNTER_FIELDS:
+			if self.get(fieldname) is None:
+				setattr(self, fieldname, 0)
+	
 	def before_save(self):
-		"""Calculate total cost before saving."""
+		"""Calculate total cost and serialise metadata before saving."""
+		if frappe.conf.developer_mode:
+			for fieldname in self._COUNTER_FIELDS:
+				assert isinstance(self.get(fieldname), (int, float)), f"{fieldname} must be numeric"
+		
 		self.calculate_total_cost()
+		
+		if self._meta_dirty:
+			self.metadata = json.dumps(self._meta_dict)
+			self._meta_dirty = False
 	
 	def calculate_total_cost(self):
-		"""Calculate total cost from all service costs."""
+		"""Calculate total cost from all service costs and the derived average response time."""
 		self.total_cost = (
-			flt(self.google_places_cost) +
-			flt(self.openai_cost) +
-			flt(self.email_service_cost) +
-			flt(self.crm_integration_cost) +
-			flt(self.data_enrichment_cost)
+			self.google_places_cost +
+			self.openai_cost +
+			self.email_service_cost +
+			self.crm_integration_cost +
+			self.data_enrichment_cost
 		)
+		
+		if self.response_time_samples > 0:
+			self.avg_response_time = self.response_time_sum / self.response_time_samples
 	
 	def add_api_usage(self, service: str, calls: int = 1, cost: float = 0.0):
 		"""Add API usage for a specific service."""
-		if service == "google_places":
-			self.google_places_calls = cint(self.google_places_calls) + calls
-			self.google_places_cost = flt(self.google_places_cost) + cost
-		elif service == "openai":
-			self.openai_calls = cint(self.openai_calls) + calls
-			self.openai_cost = flt(self.openai_cost) + cost
-		elif service == "email":
-			self.email_api_calls = cint(self.email_api_calls) + calls
-			self.email_service_cost = flt(self.email_service_cost) + cost
-		elif service == "crm":
-			self.crm_api_calls = cint(self.crm_api_calls) + calls
-			self.crm_integration_cost = flt(self.crm_integration_cost) + cost
-		elif service == "data_enrichment":
-			self.data_enrichment_calls = cint(self.data_enrichment_calls) + calls
-			self.data_enrichment_cost = flt(self.data_enrichment_cost) + cost
-		elif service == "webhook":
-			self.webhook_calls = cint(self.webhook_calls) + calls
+		fields = self._SERVICE_FIELDS.get(service)
+		if fields:
+			calls_field, cost_field = fields
+			setattr(self, calls_field, getattr(self, calls_field) + calls)
+			if cost_field:
+				setattr(self, cost_field, getattr(self, cost_field) + cost)
 		
-		self.total_requests = cint(self.total_requests) + calls
+		self.total_requests += calls
 		self.calculate_total_cost()
 	
 	def add_usage_metric(self, metric: str, count: int = 1):
 		"""Add usage metric."""
-		if metric == "leads_generated":
-			self.leads_generated = cint(self.leads_generated) + count
-		elif metric == "emails_sent":
-			self.emails_sent = cint(self.emails_sent) + count
-		elif metric == "campaigns_created":
-			self.campaigns_created = cint(self.campaigns_created) + count
-		elif metric == "ai_conversations":
-			self.ai_conversations = cint(self.ai_conversations) + count
-		elif metric == "lead_analyses":
-			self.lead_analyses = cint(self.lead_analyses) + count
-		elif metric == "email_generations":
-			self.email_generations = cint(self.email_generations) + count
+		fieldname = self._METRIC_FIELDS.get(metric)
+		if fieldname:
+			setattr(self, fieldname, getattr(self, fieldname) + count)
 	
 	def update_performance_metrics(self, response_time: float = None, success: bool = True, bandwidth: float = 0.0):
 		"""Update performance metrics."""
 		if response_time is not None:
-			# Calculate running average of response time
-			current_avg = flt(self.avg_response_time)
-			total_requests = cint(self.total_requests)
-			
-			if total_requests > 0:
-				self.avg_response_time = ((current_avg * (total_requests - 1)) + response_time) / total_requests
-			else:
-				self.avg_response_time = response_time
+			# Average over the requests that reported a timing
+			self.response_time_sum += response_time
+			self.response_time_samples += 1
+			self.avg_response_time = self.response_time_sum / self.response_time_samples
 		
 		if not success:
-			self.error_count = cint(self.error_count) + 1
+			self.error_count += 1
 		
 		# Calculate success rate
-		total_requests = cint(self.total_requests)
+		total_requests = self.total_requests
 		if total_requests > 0:
-			self.success_rate = ((total_requests - cint(self.error_count)) / total_requests) * 100
+			self.success_rate = ((total_requests - self.error_count) / total_requests) * 100
 		
 		if bandwidth > 0:
-			self.bandwidth_used = flt(self.bandwidth_used) + bandwidth
+			self.bandwidth_used += bandwidth
 	
 	def set_peak_usage_hour(self, hour: str):
 		"""Set peak usage hour."""
@@ -93,13 +124,25 @@ class LeadIntelligenceUsageStats(Document):
 	
 	def add_metadata(self, key: str, value: Any):
 		"""Add metadata information."""
-		if not self.metadata:
-			self.metadata = {}
-		elif isinstance(self.metadata, str):
-			self.metadata = json.loads(self.metadata)
+		self._get_metadata()[key] = value
+		self._meta_dirty = True
+	
+	def _get_metadata(self) -> Dict[str, Any]:
+		"""Return metadata as a dict, parsing the stored JSON only once."""
+		if self._meta_dict is None:
+			if not self.metadata:
+				self._meta_dict = {}
+			elif isinstance(self.metadata, str):
+				self._meta_dict = json.loads(self.metadata)
+			else:
+				self._meta_dict = dict(self.metadata)
 		
-		self.metadata[key] = value
-		self.metadata = json.dumps(self.metadata)
+		return self._meta_dict
+
+def on_doctype_update():
+	"""Index the (user, date) lookup used by every tracked call and the date range reports."""
+	frappe.db.add_unique("Lead Intelligence Usage Stats", ["user", "date"], constraint_name="unique_user_date")
+	frappe.db.add_index("Lead Intelligence Usage Stats", ["date"])
 
 # Utility functions for usage tracking
 def get_or_create_daily_stats(user: str = None, date: str = None) -> 'LeadIntelligenceUsageStats':
@@ -109,44 +152,170 @@ def get_or_create_daily_stats(user: str = None, date: str = None) -> 'LeadIntell
 	if not date:
 		date = nowdate()
 	
-	# Try to find existing stats for the date and user
-	existing_stats = frappe.db.get_value(
-		"Lead Intelligence Usage Stats",
-		{"user": user, "date": date},
-		"name"
+	# Reuse the document within a request, flush_usage_stats drops it once the row changes
+	cache = getattr(frappe.local, "_li_usage_stats_cache", None)
+	if cache is None:
+		cache = frappe.local._li_usage_stats_cache = {}
+	
+	key = (user, str(date))
+	if key not in cache:
+		_ensure_daily_stats(user, date)
+		cache[key] = frappe.get_doc("Lead Intelligence Usage Stats", {"user": user, "date": date})
+	
+	return cache[key]
+
+def _ensure_daily_stats(user: str, date: str):
+	"""Insert the daily stats row unless it exists, relying on the unique (user, date) index."""
+	if frappe.db.exists("Lead Intelligence Usage Stats", {"user": user, "date": date}):
+		return
+	
+	# Name the row from its series like a normal insert, so it stays a valid document
+	timestamp = now()
+	name = make_autoname(USAGE_STATS_NAMING_SERIES, "Lead Intelligence Usage Stats")
+	
+	frappe.db.sql("""
+		INSERT INTO `tabLead Intelligence Usage Stats`
+			(name, naming_series, user, date, session_id, creation, modified, owner, modified_by)
+		VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+		ON DUPLICATE KEY UPDATE name = name
+	""", (
+		name, USAGE_STATS_NAMING_SERIES, user, date, frappe.session.sid,
+		timestamp, timestamp, frappe.session.user, frappe.session.user
+	))
+
+class _UsageAggregator:
+	"""Process-local buffer of usage counter deltas keyed by (site, user, date)."""
+	
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._deltas = {}
+	
+	def add(self, user: str, date: str, deltas: Dict[str, float]):
+		"""Accumulate counter deltas for a user's daily stats row."""
+		key = (frappe.local.site, user, date)
+		with self._lock:
+			bucket = self._deltas.setdefault(key, {})
+			for fieldname, value in deltas.items():
+				bucket[fieldname] = bucket.get(fieldname, 0) + value
+	
+	def drain(self, site: str) -> Dict[tuple, Dict[str, float]]:
+		"""Remove and return all pending deltas for a site keyed by (user, date)."""
+		with self._lock:
+			keys = [key for key in self._deltas if key[0] == site]
+			pending = {key[1:]: self._deltas.pop(key) for key in keys}
+		
+		return pending
+
+_aggregator = _UsageAggregator()
+
+def _apply_usage_deltas(user: str, date: str, deltas: Dict[str, float]):
+	"""Add accumulated deltas to a user's daily stats row in a single UPDATE."""
+	assignments = []
+	values = []
+	
+	# MySQL applies SET clauses in order, so derived columns below see the new counters
+	for fieldname, value in deltas.items():
+		assignments.append(f"`{fieldname}` = COALESCE(`{fieldname}`, 0) + %s")
+		values.append(value)
+	
+	assignments.append(
+		"total_cost = COALESCE(google_places_cost, 0) + COALESCE(openai_cost, 0)"
+		" + COALESCE(email_service_cost, 0) + COALESCE(crm_integration_cost, 0)"
+		" + COALESCE(data_enrichment_cost, 0)"
+	)
+	assignments.append(
+		"avg_response_time = CASE WHEN response_time_samples > 0"
+		" THEN COALESCE(response_time_sum, 0) / response_time_samples"
+		" ELSE avg_response_time END"
 	)
+	assignments.append(
+		"success_rate = CASE WHEN total_requests > 0"
+		" THEN (total_requests - COALESCE(error_count, 0)) / total_requests * 100"
+		" ELSE success_rate END"
+	)
+	
+	values.extend([user, date])
+	frappe.db.sql(f"""
+		UPDATE `tabLead Intelligence Usage Stats`
+		SET {", ".join(assignments)}
+		WHERE user = %s AND date = %s
+	""", values)
+
+def flush_usage_stats(commit: bool = True):
+	"""Write buffered usage deltas for the current site, one UPDATE per (user, date).
+	
+	The buffer is shared by every request on the worker, so it is only drained from the
+	after_request/after_job hooks, which run once the main transaction has ended and commit
+	their own writes. commit=False leaves the writes in the caller's transaction.
+	"""
+	pending = _aggregator.drain(frappe.local.site)
+	if not pending:
+		return
 	
-	if existing_stats:
-		return frappe.get_doc("Lead Intelligence Usage Stats", existing_stats)
+	cache = getattr(frappe.local, "_li_usage_stats_cache", None) or {}
+	for (user, date), deltas in pending.items():
+		_ensure_daily_stats(user, date)
+		_apply_usage_deltas(user, date, deltas)
+		cache.pop((user, str(date)), None)
+	
+	if commit:
+		frappe.db.commit()
 	else:
-		# Create new stats document
-		stats = frappe.new_doc("Lead Intelligence Usage Stats")
-		stats.user = user
-		stats.date = date
-		stats.session_id = frappe.session.sid
-		stats.insert(ignore_permissions=True)
-		return stats
+		# Make sure the surrounding request commits even if it is a GET
+		frappe.local.flags.commit = True
+
+def _safe_track(func):
+	"""Log and swallow tracking errors so usage accounting never breaks the caller."""
+	@functools.wraps(func)
+	def wrapper(*args, **kwargs):
+		try:
+			return func(*args, **kwargs)
+		except Exception:
+			# log_error formats the traceback itself, only on this path
+			frappe.log_error(title="Lead Intelligence Usage Tracking")
+	
+	return wrapper
 
+@_safe_track
 def track_api_usage(service: str, calls: int = 1, cost: float = 0.0, user: str = None, response_time: float = None, success: bool = True, bandwidth: float = 0.0):
 	"""Track API usage for a service."""
-	try:
-		stats = get_or_create_daily_stats(user)
-		stats.add_api_usage(service, calls, cost)
-		stats.update_performance_metrics(response_time, success, bandwidth)
-		stats.save(ignore_permissions=True)
-		frappe.db.commit()
-	except Exception as e:
-		frappe.log_error(f"Error tracking API usage: {str(e)}", "Lead Intelligence Usage Tracking")
+	deltas = {"total_requests": calls}
+	
+	fields = LeadIntelligenceUsageStats._SERVICE_FIELDS.get(service)
+	if fields:
+		calls_field, cost_field = fields
+		deltas[calls_field] = calls
+		if cost_field:
+			deltas[cost_field] = cost
+	
+	if response_time is not None:
+		deltas["response_time_sum"] = response_time
+		deltas["response_time_samples"] = 1
+	if not success:
+		deltas["error_count"] = 1
+	if bandwidth > 0:
+		deltas["bandwidth_used"] = bandwidth
+	
+	_aggregator.add(user or frappe.session.user, nowdate(), deltas)
 
+@_safe_track
 def track_usage_metric(metric: str, count: int = 1, user: str = None):
 	"""Track usage metrics."""
-	try:
-		stats = get_or_create_daily_stats(user)
-		stats.add_usage_metric(metric, count)
-		stats.save(ignore_permissions=True)
-		frappe.db.commit()
-	except Exception as e:
-		frappe.log_error(f"Error tracking usage metric: {str(e)}", "Lead Intelligence Usage Tracking")
+	fieldname = LeadIntelligenceUsageStats._METRIC_FIELDS.get(metric)
+	if not fieldname:
+		return
+	
+	_aggregator.add(user or frappe.session.user, nowdate(), {fieldname: count})
+
+def _date_filter(from_date: str = None, to_date: str = None) -> Optional[List]:
+	"""Build the date filter for an optional from/to range."""
+	if from_date and to_date:
+		return ["between", [from_date, to_date]]
+	if from_date:
+		return [">=", from_date]
+	if to_date:
+		return ["<=", to_date]
+	return None
 
 def get_usage_summary(user: str = None, from_date: str = None, to_date: str = None) -> Dict[str, Any]:
 	"""Get usage summary for a user or date range."""
@@ -154,13 +323,10 @@ def get_usage_summary(user: str = None, from_date: str = None, to_date: str = No
 	
 	if user:
 		filters["user"] = user
-	if from_date:
-		filters["date"] = [">=", from_date]
-	if to_date:
-		if "date" in filters:
-			filters["date"] = ["between", [from_date, to_date]]
-		else:
-			filters["date"] = ["<=", to_date]
+	
+	date_filter = _date_filter(from_date, to_date)
+	if date_filter:
+		filters["date"] = date_filter
 	
 	stats = frappe.get_all(
 		"Lead Intelligence Usage Stats",
@@ -198,8 +364,9 @@ def get_daily_usage_trend(user: str = None, days: int = 30) -> List[Dict[str, An
 	if user:
 		filters["user"] = user
 	
+	# Read the narrow pre-aggregated rollup instead of the raw stats rows
 	stats = frappe.get_all(
-		"Lead Intelligence Usage Stats",
+		"Lead Intelligence Daily Rollup",
 		filters=filters,
 		fields=[
 			"date",
@@ -221,13 +388,10 @@ def get_service_usage_breakdown(user: str = None, from_date: str = None, to_date
 	
 	if user:
 		filters["user"] = user
-	if from_date:
-		filters["date"] = [">=", from_date]
-	if to_date:
-		if "date" in filters:
-			filters["date"] = ["between", [from_date, to_date]]
-		else:
-			filters["date"] = ["<=", to_date]
+	
+	date_filter = _date_filter(from_date, to_date)
+	if date_filter:
+		filters["date"] = date_filter
 	
 	stats = frappe.get_all(
 		"Lead Intelligence Usage Stats",
@@ -283,13 +447,9 @@ def get_top_users_by_usage(limit: int = 10, from_date: str = None, to_date: str
 	"""Get top users by usage."""
 	filters = {}
 	
-	if from_date:
-		filters["date"] = [">=", from_date]
-	if to_date:
-		if "date" in filters:
-			filters["date"] = ["between", [from_date, to_date]]
-		else:
-			filters["date"] = ["<=", to_date]
+	date_filter = _date_filter(from_date, to_date)
+	if date_filter:
+		filters["date"] = date_filter
 	
 	stats = frappe.get_all(
 		"Lead Intelligence Usage Stats",
@@ -312,17 +472,14 @@ def cleanup_old_stats(days: int = 90):
 	"""Clean up old usage statistics."""
 	cutoff_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
 	
-	old_stats = frappe.get_all(
-		"Lead Intelligence Usage Stats",
-		filters={"date": ["<", cutoff_date]},
-		fields=["name"]
-	)
+	filters = {"date": ["<", cutoff_date]}
+	old_stats_count = frappe.db.count("Lead Intelligence Usage Stats", filters)
 	
-	for stat in old_stats:
-		frappe.delete_doc("Lead Intelligence Usage Stats", stat.name, ignore_permissions=True)
+	# Stats rows have no delete hooks, so remove them in a single statement
+	frappe.db.delete("Lead Intelligence Usage Stats", filters)
 	
 	frappe.db.commit()
-	frappe.log_error(f"Cleaned up {len(old_stats)} old usage statistics", "Lead Intelligence Cleanup")
+	frappe.log_error(f"Cleaned up {old_stats_count} old usage statistics", "Lead Intelligence Cleanup")
 
 def get_cost_analysis(user: str = None, from_date: str = None, to_date: str = None) -> Dict[str, Any]:
 	"""Get detailed cost analysis."""
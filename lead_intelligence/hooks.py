@@ -119,6 +119,12 @@ doctype_js = {
 #		"on_trash": "method"
 #	}
 # }
+doc_events = {
+    "Lead Intelligence Settings": {
+        "on_update": "lead_intelligence.tasks.clear_li_settings_cache",
+        "on_trash": "lead_intelligence.tasks.clear_li_settings_cache"
+    }
+}
 
 # Scheduled Tasks
 # ---------------
@@ -129,6 +135,10 @@ scheduler_events = {
         "*/5 * * * *": [
             "lead_intelligence.api.campaigns.process_scheduled_campaigns"
         ],
+        # Refresh the daily usage rollup every 10 minutes
+        "*/10 * * * *": [
+            "lead_intelligence.doctype.lead_intelligence_daily_rollup.lead_intelligence_daily_rollup.update_daily_rollup"
+        ],
         # Update analytics daily at 2 AM
         "0 2 * * *": [
             "lead_intelligence.api.analytics.update_daily_analytics"
@@ -171,12 +181,16 @@ scheduler_events = {
 # Request Events
 # ----------------
 # before_request = ["lead_intelligence.utils.before_request"]
-# after_request = ["lead_intelligence.utils.after_request"]
+after_request = [
+    "lead_intelligence.doctype.lead_intelligence_usage_stats.lead_intelligence_usage_stats.flush_usage_stats"
+]
 
 # Job Events
 # ----------
 # before_job = ["lead_intelligence.utils.before_job"]
-# after_job = ["lead_intelligence.utils.after_job"]
+after_job = [
+    "lead_intelligence.doctype.lead_intelligence_usage_stats.lead_intelligence_usage_stats.flush_usage_stats"
+]
 
 # User Data Protection
 # --------------------
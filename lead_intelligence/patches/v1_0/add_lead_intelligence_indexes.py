@@ -0,0 +1,11 @@
+# Copyright (c) 2024, Frappe Technologies and contributors
+# For license information, please see license.txt
+
+from lead_intelligence.install import add_lead_indexes
+from lead_intelligence.doctype.campaign_execution.campaign_execution import on_doctype_update
+
+
+def execute():
+	"""Add the Lead and Campaign Execution indexes used by the scheduled tasks."""
+	add_lead_indexes()
+	on_doctype_update()
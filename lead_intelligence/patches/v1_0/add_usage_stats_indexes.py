@@ -0,0 +1,44 @@
+# Copyright (c) 2024, Frappe Technologies and contributors
+# For license information, please see license.txt
+
+import frappe
+from lead_intelligence.doctype.lead_intelligence_usage_stats.lead_intelligence_usage_stats import (
+	LeadIntelligenceUsageStats
+)
+
+
+def execute():
+	"""Merge duplicate daily stats rows so model sync can add the unique (user, date) index.
+	
+	Runs before model sync, so only counters that already exist as columns are merged.
+	"""
+	doctype = "Lead Intelligence Usage Stats"
+	if not frappe.db.table_exists(doctype):
+		return
+	
+	columns = set(frappe.db.get_table_columns(doctype))
+	counter_fields = [f for f in LeadIntelligenceUsageStats._COUNTER_FIELDS if f in columns]
+	
+	duplicates = frappe.db.sql("""
+		SELECT user, date
+		FROM `tabLead Intelligence Usage Stats`
+		GROUP BY user, date
+		HAVING COUNT(*) > 1
+	""", as_dict=True)
+	
+	for row in duplicates:
+		names = frappe.get_all(
+			doctype,
+			filters={"user": row.user, "date": row.date},
+			order_by="creation asc",
+			pluck="name"
+		)
+		
+		totals = frappe.db.sql(f"""
+			SELECT {", ".join(f"COALESCE(SUM(`{f}`), 0) AS `{f}`" for f in counter_fields)}
+			FROM `tabLead Intelligence Usage Stats`
+			WHERE name IN %(names)s
+		""", {"names": names}, as_dict=True)[0]
+		
+		frappe.db.set_value(doctype, names[0], totals, update_modified=False)
+		frappe.db.delete(doctype, {"name": ["in", names[1:]]})
@@ -0,0 +1,18 @@
+# Copyright (c) 2024, Frappe Technologies and contributors
+# For license information, please see license.txt
+
+import frappe
+
+
+def execute():
+	"""Seed response_time_sum and response_time_samples from the previously stored running average.
+	
+	The old average was taken over every request, so total_requests stands in for the sample count.
+	"""
+	frappe.db.sql("""
+		UPDATE `tabLead Intelligence Usage Stats`
+		SET response_time_sum = COALESCE(avg_response_time, 0) * COALESCE(total_requests, 0),
+			response_time_samples = COALESCE(total_requests, 0)
+		WHERE COALESCE(response_time_sum, 0) = 0
+			AND COALESCE(avg_response_time, 0) > 0
+	""")
@@ -0,0 +1,16 @@
+# Copyright (c) 2024, Frappe Technologies and contributors
+# For license information, please see license.txt
+
+import frappe
+from lead_intelligence.doctype.lead_intelligence_usage_stats.lead_intelligence_usage_stats import (
+	USAGE_STATS_NAMING_SERIES
+)
+
+
+def execute():
+	"""Fill the mandatory naming_series on daily stats rows inserted without it."""
+	frappe.db.sql("""
+		UPDATE `tabLead Intelligence Usage Stats`
+		SET naming_series = %s
+		WHERE COALESCE(naming_series, '') = ''
+	""", (USAGE_STATS_NAMING_SERIES,))
@@ -2,9 +2,17 @@
 # For license information, please see license.txt
 
 import frappe
-from frappe.utils import now, add_days, get_datetime
+from frappe.utils import now, add_days, get_datetime, cint
 from datetime import datetime, timedelta
+from collections import defaultdict
 import json
+import re
+
+logger = frappe.logger("lead_intelligence", allow_site=True, file_count=5)
+
+_DIGITS_RE = re.compile(r"\D")
+# Same list as utils._FREE_EMAIL_DOMAINS
+_FREEMAIL = frozenset(("gmail.com", "yahoo.com", "hotmail.com", "outlook.com", "icloud.com", "aol.com"))
 
 
 def all():
@@ -79,6 +87,9 @@ def monthly():
 		frappe.log_error(f"Monthly task error: {str(e)}", "Lead Intelligence Monthly Tasks")
 
 
+ERROR_LOG_DELETE_CHUNK = 5000
+
+
 def cleanup_old_data():
 	"""Clean up old data (runs daily at midnight)"""
 	try:
@@ -95,16 +106,26 @@ def cleanup_old_data():
 			"status": ["in", ["Completed", "Failed", "Cancelled"]]
 		})
 		
-		# Clean up old error logs
+		frappe.db.commit()
+		
+		# Clean up old error logs in bounded chunks so one tick never holds
+		# long locks on the table
 		cutoff_date = add_days(now(), -7)
-		frappe.db.sql("""
-			DELETE FROM `tabError Log`
-			WHERE creation < %s
-			AND error LIKE '%Lead Intelligence%'
-		""", (cutoff_date,))
+		while True:
+			frappe.db.sql("""
+				DELETE FROM `tabError Log`
+				WHERE creation < %s
+				AND error LIKE %s
+				ORDER BY creation
+				LIMIT %s
+			""", (cutoff_date, "%Lead Intelligence%", ERROR_LOG_DELETE_CHUNK))
+			deleted = frappe.db.sql("SELECT ROW_COUNT()")[0][0]
+			frappe.db.commit()
+			
+			if deleted < ERROR_LOG_DELETE_CHUNK:
+				break
 		
-		frappe.db.commit()
-		frappe.log_error("Old data cleanup completed", "Lead Intelligence Cleanup")
+		logger.info("Old data cleanup completed")
 		
 	except Exception as e:
 		frappe.log_error(f"Cleanup task error: {str(e)}", "Lead Intelligence Cleanup")
@@ -123,12 +144,17 @@ def process_campaign_queue():
 			limit=5  # Process max 5 campaigns at a time
 		)
 		
+		if not pending_campaigns:
+			return
+		
+		# Update status to Processing for the whole batch in one UPDATE
+		names = [campaign.name for campaign in pending_campaigns]
+		frappe.db.set_value("Lead Campaign", {"name": ["in", names]}, "status", "Processing")
+		frappe.db.commit()
+		
+		failed = []
 		for campaign in pending_campaigns:
 			try:
-				# Update status to Processing
-				frappe.db.set_value("Lead Campaign", campaign.name, "status", "Processing")
-				frappe.db.commit()
-				
 				# Queue the campaign for background processing
 				frappe.enqueue(
 					"lead_intelligence.lead_intelligence.doctype.lead_campaign.lead_campaign.execute_campaign",
@@ -139,9 +165,12 @@ def process_campaign_queue():
 				
 			except Exception as e:
 				frappe.log_error(f"Campaign queue processing error for {campaign.name}: {str(e)}", "Lead Intelligence Campaign Queue")
-				# Reset status back to Queued for retry
-				frappe.db.set_value("Lead Campaign", campaign.name, "status", "Queued")
-				frappe.db.commit()
+				failed.append(campaign.name)
+		
+		if failed:
+			# Reset status back to Queued for retry
+			frappe.db.set_value("Lead Campaign", {"name": ["in", failed]}, "status", "Queued")
+			frappe.db.commit()
 		
 	except Exception as e:
 		frappe.log_error(f"Campaign queue task error: {str(e)}", "Lead Intelligence Campaign Queue")
@@ -151,27 +180,80 @@ def sync_crm_data():
 	"""Sync data with CRM systems (runs every 6 hours)"""
 	try:
 		# Get CRM settings
-		settings = frappe.get_single("Lead Intelligence Settings")
+		settings = _get_li_settings()
 		
-		if not settings.active:
+		if not settings:
 			return
 		
+		crm = settings.get("crm_integration")
+		jobs = []
+		
 		# Sync with Salesforce
-		if settings.salesforce_enabled and settings.salesforce_client_id:
-			sync_salesforce_data()
+		if crm == "Salesforce" and settings.get("salesforce_client_id"):
+			jobs.append("sync_salesforce_data")
 		
 		# Sync with HubSpot
-		if settings.hubspot_enabled and settings.hubspot_api_key:
-			sync_hubspot_data()
+		if crm == "HubSpot" and settings.get("hubspot_api_key"):
+			jobs.append("sync_hubspot_data")
 		
 		# Sync with Pipedrive
-		if settings.pipedrive_enabled and settings.pipedrive_api_key:
-			sync_pipedrive_data()
+		if crm == "Pipedrive" and settings.get("pipedrive_api_token"):
+			jobs.append("sync_pipedrive_data")
+		
+		# Each vendor sync runs as its own background job so they proceed in
+		# parallel across workers instead of one after another
+		for job in jobs:
+			frappe.enqueue(
+				f"lead_intelligence.tasks.{job}",
+				queue="long",
+				timeout=3600
+			)
 		
 	except Exception as e:
 		frappe.log_error(f"CRM sync task error: {str(e)}", "Lead Intelligence CRM Sync")
 
 
+LI_SETTINGS_CACHE_KEY = "li:settings"
+LI_SETTINGS_STALE_KEY = "li:settings:stale"
+LI_SETTINGS_FIELDS = ["is_active", "crm_integration", "salesforce_client_id", "hubspot_api_key", "pipedrive_api_token"]
+
+
+def _get_li_settings():
+	"""Return the settings fields the scheduled jobs need, or an empty dict when inactive.
+
+	Looked up per request first, then in Redis, and only then with one narrow
+	read of the single doctype. If the database read fails, the last known copy
+	is served instead.
+	"""
+	settings = getattr(frappe.local, "li_settings_cache", None)
+	if settings is not None:
+		return settings
+	
+	cache = frappe.cache()
+	settings = cache.get_value(LI_SETTINGS_CACHE_KEY)
+	if settings is None:
+		try:
+			rows = frappe.db.get_values_from_single(LI_SETTINGS_FIELDS, None,
+				"Lead Intelligence Settings", as_dict=True)
+			settings = rows[0] if rows and cint(rows[0].get("is_active")) else {}
+		except Exception:
+			settings = cache.get_value(LI_SETTINGS_STALE_KEY)
+			if settings is None:
+				raise
+		else:
+			cache.set_value(LI_SETTINGS_CACHE_KEY, settings, expires_in_sec=3600)
+			cache.set_value(LI_SETTINGS_STALE_KEY, settings)
+	
+	frappe.local.li_settings_cache = settings
+	return settings
+
+
+def clear_li_settings_cache(doc=None, method=None):
+	"""Drop cached settings (doc_events hook on Lead Intelligence Settings)"""
+	frappe.cache().delete_value(LI_SETTINGS_CACHE_KEY)
+	frappe.local.li_settings_cache = None
+
+
 # Helper functions
 
 def cleanup_old_usage_stats():
@@ -193,7 +275,7 @@ def generate_daily_usage_summary():
 		usage_summary = get_usage_summary(yesterday, yesterday)
 		
 		# Log the summary
-		frappe.log_error(f"Daily usage summary: {json.dumps(usage_summary, indent=2)}", "Lead Intelligence Daily Usage")
+		logger.info(f"Daily usage summary: {json.dumps(usage_summary)}")
 		
 	except Exception as e:
 		frappe.log_error(f"Daily usage summary error: {str(e)}", "Lead Intelligence Daily Usage")
@@ -217,15 +299,22 @@ def check_api_usage_limits():
 			warnings.append("OpenAI API usage is at 80% of daily limit")
 		
 		if warnings:
-			# Send notification to administrators
-			from frappe.email.queue import send
-			admins = frappe.get_all("User", filters={"role_profile_name": "System Manager"}, fields=["email"])
+			# Send one notification to all enabled System Managers
+			admins = frappe.db.sql_list("""
+				SELECT DISTINCT u.email
+				FROM `tabUser` u
+				JOIN `tabHas Role` r ON r.parent = u.name AND r.parenttype = 'User'
+				WHERE r.role = 'System Manager'
+				AND u.enabled = 1
+				AND IFNULL(u.email, '') != ''
+			""")
 			
-			for admin in admins:
-				send(
-					recipients=[admin.email],
+			if admins:
+				frappe.sendmail(
+					recipients=admins,
 					subject="Lead Intelligence API Usage Warning",
-					message="\n".join(warnings)
+					message="\n".join(warnings),
+					now=False
 				)
 		
 	except Exception as e:
@@ -235,32 +324,100 @@ def check_api_usage_limits():
 def update_lead_scores():
 	"""Update lead scores based on recent activities"""
 	try:
-		# Get leads updated in the last 24 hours
+		# Score leads updated in the last 24 hours with one set-based UPDATE
+		# per chunk, so memory and row locks stay bounded
 		yesterday = add_days(now(), -1)
-		leads = frappe.get_all("Lead", 
-			filters={"modified": [">=", yesterday]},
-			fields=["name", "lead_name", "email_id", "phone", "company_name"]
-		)
-		
-		for lead in leads:
-			try:
-				# Calculate lead score based on completeness and quality
-				score = calculate_lead_score(lead)
-				
-				# Update the lead score
-				frappe.db.set_value("Lead", lead.name, "lead_score", score)
-				
-			except Exception as e:
-				frappe.log_error(f"Lead score update error for {lead.name}: {str(e)}", "Lead Intelligence Lead Scoring")
-		
-		frappe.db.commit()
+		for names in _iter_name_chunks("Lead", {"modified": [">=", yesterday]}, LEAD_SCORE_CHUNK):
+			frappe.db.sql(LEAD_SCORE_UPDATE_SQL, (names,))
+			frappe.db.commit()
 		
 	except Exception as e:
 		frappe.log_error(f"Lead score update task error: {str(e)}", "Lead Intelligence Lead Scoring")
 
 
+_FREEMAIL_SQL = ", ".join(f"'{domain}'" for domain in sorted(_FREEMAIL))
+
+# SQL equivalent of calculate_lead_score; keep the two in sync
+LEAD_SCORE_UPDATE_SQL = f"""
+	UPDATE `tabLead`
+	SET lead_score = LEAST(100,
+		IF(IFNULL(lead_name, '') != '', 10, 0)
+		+ IF(IFNULL(email_id, '') != '', 15, 0)
+		+ IF(IFNULL(phone, '') != '', 10, 0)
+		+ IF(IFNULL(company_name, '') != '', 5, 0)
+		+ IF(LOCATE('@', IFNULL(email_id, '')) > 0 AND LOCATE('.', email_id) > 0,
+			10 + IF(SUBSTRING_INDEX(LOWER(email_id), '@', -1) IN ({_FREEMAIL_SQL}), 0, 10), 0)
+		+ CASE
+			WHEN CHAR_LENGTH(REGEXP_REPLACE(IFNULL(phone, ''), '[^0-9]', '')) >= 10 THEN 20
+			WHEN CHAR_LENGTH(REGEXP_REPLACE(IFNULL(phone, ''), '[^0-9]', '')) >= 7 THEN 10
+			ELSE 0
+		END
+		+ IF(IFNULL(company_name, '') != '', 20, 0)
+	)
+	WHERE name IN %s
+"""
+
+LEAD_SCORE_CHUNK = 5000
+
+
+def _iter_name_chunks(doctype, filters, chunk_size):
+	"""Yield tuples of matching names, paging on name so each SELECT stays cheap"""
+	last_name = None
+	while True:
+		chunk_filters = dict(filters)
+		if last_name is not None:
+			chunk_filters["name"] = [">", last_name]
+		
+		names = frappe.get_all(doctype, filters=chunk_filters, order_by="name asc",
+			limit_page_length=chunk_size, pluck="name")
+		if not names:
+			return
+		
+		yield tuple(names)
+		
+		if len(names) < chunk_size:
+			return
+		last_name = names[-1]
+
+
+def bulk_update(doctype, updates, chunk_size=100):
+	"""Write {name: {fieldname: value}} updates in chunked CASE WHEN UPDATEs"""
+	if not updates:
+		return
+	
+	if hasattr(frappe.db, "bulk_update"):
+		frappe.db.bulk_update(doctype, updates, chunk_size=chunk_size)
+		return
+	
+	# Older Frappe versions without db.bulk_update
+	names = list(updates)
+	for i in range(0, len(names), chunk_size):
+		chunk = names[i:i + chunk_size]
+		fieldnames = sorted({fieldname for name in chunk for fieldname in updates[name]})
+		
+		assignments = []
+		values = []
+		for fieldname in fieldnames:
+			cases = []
+			for name in chunk:
+				if fieldname in updates[name]:
+					cases.append("WHEN %s THEN %s")
+					values.extend([name, updates[name][fieldname]])
+			assignments.append(f"`{fieldname}` = CASE name {' '.join(cases)} ELSE `{fieldname}` END")
+		
+		values.extend(chunk)
+		frappe.db.sql(f"""
+			UPDATE `tab{doctype}`
+			SET {", ".join(assignments)}
+			WHERE name IN ({", ".join(["%s"] * len(chunk))})
+		""", values)
+
+
 def calculate_lead_score(lead):
-	"""Calculate lead score based on data completeness and quality"""
+	"""Calculate lead score based on data completeness and quality
+
+	Per-row utility; the scheduled job uses LEAD_SCORE_UPDATE_SQL instead.
+	"""
 	score = 0
 	
 	# Basic information completeness (40 points max)
@@ -279,12 +436,12 @@ def calculate_lead_score(lead):
 		if "@" in email and "." in email:
 			score += 10
 			# Bonus for business domains
-			if not any(domain in email.lower() for domain in ["gmail", "yahoo", "hotmail", "outlook"]):
+			if email.rpartition("@")[2].lower() not in _FREEMAIL:
 				score += 10
 	
 	# Phone quality (20 points max)
 	if lead.get("phone"):
-		phone = str(lead.get("phone")).replace(" ", ").replace("-", ").replace("(", ").replace(")", "")
+		phone = _DIGITS_RE.sub("", str(lead.get("phone") or ""))
 		if len(phone) >= 10:
 			score += 20
 		elif len(phone) >= 7:
@@ -307,10 +464,11 @@ def process_pending_email_campaigns():
 				"execution_type": "Email Campaign",
 				"scheduled_time": ["<=", now()]
 			},
-			fields=["name", "campaign", "target_leads"],
+			fields=["name", "lead_campaign", "target_leads"],
 			limit=10
 		)
 		
+		queued = []
 		for email_campaign in pending_emails:
 			try:
 				# Queue for background processing
@@ -320,14 +478,15 @@ def process_pending_email_campaigns():
 					queue="email_sending",
 					timeout=1800
 				)
-				
-				# Update status
-				frappe.db.set_value("Campaign Execution", email_campaign.name, "status", "Processing")
+				queued.append(email_campaign.name)
 				
 			except Exception as e:
 				frappe.log_error(f"Email campaign processing error for {email_campaign.name}: {str(e)}", "Lead Intelligence Email Campaigns")
 		
-		frappe.db.commit()
+		# Update status for everything that was queued in one UPDATE
+		if queued:
+			frappe.db.set_value("Campaign Execution", {"name": ["in", queued]}, "status", "Processing")
+			frappe.db.commit()
 		
 	except Exception as e:
 		frappe.log_error(f"Email campaign processing task error: {str(e)}", "Lead Intelligence Email Campaigns")
@@ -342,44 +501,46 @@ def update_campaign_statuses():
 			fields=["name", "status"]
 		)
 		
+		if not active_campaigns:
+			return
+		
+		# Count executions per campaign and status in one query
+		status_rows = frappe.db.sql("""
+			SELECT lead_campaign, status, COUNT(*) AS count
+			FROM `tabCampaign Execution`
+			WHERE lead_campaign IN %(names)s
+			GROUP BY lead_campaign, status
+		""", {"names": tuple(campaign.name for campaign in active_campaigns)}, as_dict=True)
+		
+		counts_by_campaign = defaultdict(dict)
+		for row in status_rows:
+			counts_by_campaign[row.lead_campaign][row.status] = row.count
+		
+		updates = {}
 		for campaign in active_campaigns:
-			try:
-				# Check execution status
-				executions = frappe.get_all("Campaign Execution",
-					filters={"campaign": campaign.name},
-					fields=["status"]
-				)
-				
-				if not executions:
-					continue
-				
-				# Determine overall status
-				status_counts = {}
-				for execution in executions:
-					status = execution.status
-					status_counts[status] = status_counts.get(status, 0) + 1
-				
-				total_executions = len(executions)
-				completed = status_counts.get("Completed", 0)
-				failed = status_counts.get("Failed", 0)
-				processing = status_counts.get("Processing", 0)
-				
-				# Update campaign status
-				if completed == total_executions:
-					new_status = "Completed"
-				elif failed == total_executions:
-					new_status = "Failed"
-				elif processing > 0:
-					new_status = "Processing"
-				else:
-					new_status = "Active"
-				
-				if new_status != campaign.status:
-					frappe.db.set_value("Lead Campaign", campaign.name, "status", new_status)
-				
-			except Exception as e:
-				frappe.log_error(f"Campaign status update error for {campaign.name}: {str(e)}", "Lead Intelligence Campaign Status")
+			status_counts = counts_by_campaign.get(campaign.name)
+			if not status_counts:
+				continue
+			
+			# Determine overall status
+			total_executions = sum(status_counts.values())
+			completed = status_counts.get("Completed", 0)
+			failed = status_counts.get("Failed", 0)
+			processing = status_counts.get("Processing", 0)
+			
+			if completed == total_executions:
+				new_status = "Completed"
+			elif failed == total_executions:
+				new_status = "Failed"
+			elif processing > 0:
+				new_status = "Processing"
+			else:
+				new_status = "Active"
+			
+			if new_status != campaign.status:
+				updates[campaign.name] = {"status": new_status}
 		
+		bulk_update("Lead Campaign", updates)
 		frappe.db.commit()
 		
 	except Exception as e:
@@ -391,7 +552,7 @@ def retry_failed_webhooks():
 	try:
 		# This would typically check a webhook delivery log
 		# For now, we'll just log that the task ran
-		frappe.log_error("Webhook retry task completed", "Lead Intelligence Webhooks")
+		logger.info("Webhook retry task completed")
 		
 	except Exception as e:
 		frappe.log_error(f"Webhook retry task error: {str(e)}", "Lead Intelligence Webhooks")
@@ -401,7 +562,7 @@ def generate_weekly_analytics_report():
 	"""Generate weekly analytics report"""
 	try:
 		# This would generate and send weekly reports
-		frappe.log_error("Weekly analytics report generated", "Lead Intelligence Analytics")
+		logger.info("Weekly analytics report generated")
 		
 	except Exception as e:
 		frappe.log_error(f"Weekly analytics report error: {str(e)}", "Lead Intelligence Analytics")
@@ -421,7 +582,7 @@ def update_lead_quality_scores():
 	"""Update lead quality scores"""
 	try:
 		# This would update lead quality scores based on various factors
-		frappe.log_error("Lead quality scores updated", "Lead Intelligence Quality")
+		logger.info("Lead quality scores updated")
 		
 	except Exception as e:
 		frappe.log_error(f"Lead quality score update error: {str(e)}", "Lead Intelligence Quality")
@@ -431,7 +592,7 @@ def generate_monthly_performance_report():
 	"""Generate monthly performance report"""
 	try:
 		# This would generate comprehensive monthly reports
-		frappe.log_error("Monthly performance report generated", "Lead Intelligence Performance")
+		logger.info("Monthly performance report generated")
 		
 	except Exception as e:
 		frappe.log_error(f"Monthly performance report error: {str(e)}", "Lead Intelligence Performance")
@@ -442,19 +603,22 @@ def archive_old_leads():
 	try:
 		# Archive leads older than 1 year that haven't been converted
 		cutoff_date = add_days(now(), -365)
-		old_leads = frappe.get_all("Lead",
-			filters={
-				"creation": ["<", cutoff_date],
-				"status": ["not in", ["Converted", "Customer"]]
-			},
-			fields=["name"]
-		)
+		filters = {
+			"creation": ["<", cutoff_date],
+			"status": ["not in", ["Converted", "Customer", "Archived"]]
+		}
+		archived_count = frappe.db.count("Lead", filters)
 		
-		for lead in old_leads:
-			frappe.db.set_value("Lead", lead.name, "status", "Archived")
+		# Archive in a single UPDATE instead of loading every lead
+		frappe.db.sql("""
+			UPDATE `tabLead`
+			SET status = %s, modified = %s, modified_by = %s
+			WHERE creation < %s
+			AND status NOT IN ('Converted', 'Customer', 'Archived')
+		""", ("Archived", now(), frappe.session.user, cutoff_date))
 		
 		frappe.db.commit()
-		frappe.log_error(f"Archived {len(old_leads)} old leads", "Lead Intelligence Archive")
+		logger.info(f"Archived {archived_count} old leads")
 		
 	except Exception as e:
 		frappe.log_error(f"Lead archiving error: {str(e)}", "Lead Intelligence Archive")
@@ -464,7 +628,7 @@ def update_system_performance_metrics():
 	"""Update system performance metrics"""
 	try:
 		# This would calculate and store system performance metrics
-		frappe.log_error("System performance metrics updated", "Lead Intelligence Performance")
+		logger.info("System performance metrics updated")
 		
 	except Exception as e:
 		frappe.log_error(f"System performance metrics error: {str(e)}", "Lead Intelligence Performance")
@@ -474,7 +638,7 @@ def sync_salesforce_data():
 	"""Sync data with Salesforce"""
 	try:
 		# This would sync leads and contacts with Salesforce
-		frappe.log_error("Salesforce sync completed", "Lead Intelligence CRM Sync")
+		logger.info("Salesforce sync completed")
 		
 	except Exception as e:
 		frappe.log_error(f"Salesforce sync error: {str(e)}", "Lead Intelligence CRM Sync")
@@ -484,7 +648,7 @@ def sync_hubspot_data():
 	"""Sync data with HubSpot"""
 	try:
 		# This would sync leads and contacts with HubSpot
-		frappe.log_error("HubSpot sync completed", "Lead Intelligence CRM Sync")
+		logger.info("HubSpot sync completed")
 		
 	except Exception as e:
 		frappe.log_error(f"HubSpot sync error: {str(e)}", "Lead Intelligence CRM Sync")
@@ -494,7 +658,7 @@ def sync_pipedrive_data():
 	"""Sync data with Pipedrive"""
 	try:
 		# This would sync leads and contacts with Pipedrive
-		frappe.log_error("Pipedrive sync completed", "Lead Intelligence CRM Sync")
+		logger.info("Pipedrive sync completed")
 		
 	except Exception as e:
 		frappe.log_error(f"Pipedrive sync error: {str(e)}", "Lead Intelligence CRM Sync")
\ No newline at end of file
@@ -2,56 +2,136 @@
 # For license information, please see license.txt
 
 import frappe
-from frappe.utils import now, get_datetime, add_days, cstr, flt, cint
+from frappe.utils import now, now_datetime, get_datetime, add_days, cstr, flt, cint, get_fullname, get_system_timezone
 from frappe import _
+import csv
+import functools
+import io
 import json
 import re
+import secrets
 import requests
-from datetime import datetime, timedelta
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
 import hashlib
 import base64
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterable, Union
+
+try:
+	from openpyxl import Workbook
+except ImportError:
+	Workbook = None
+
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+_PHONE_STRIP_RE = re.compile(r'[\s\-\(\)\+]')
+_PHONE_CLEAN_RE = re.compile(r'[^\d\+]')
+_URL_RE = re.compile(r'^https?:\/\/(?:www\.)?[-a-zA-Z0-9@:%._\+~#=]{1,256}\.[a-zA-Z0-9()]{1,6}\b(?:[-a-zA-Z0-9()@:%_\+.~#?&=]*)$')
+_FREE_EMAIL_DOMAINS = frozenset({"gmail.com", "yahoo.com", "hotmail.com", "outlook.com", "icloud.com", "aol.com"})
+# Trailing legal suffixes, stripped together in one pass ("Acme Co. Inc" -> "Acme")
+_COMPANY_SUFFIX_RE = re.compile(
+	r'(?:\s*\b(?:Inc|LLC|Corp|Corporation|Ltd|Limited|Co|Company)\.?)+$',
+	re.IGNORECASE
+)
 
 
 # API Utilities
-def get_api_settings(service_name: str) -> Dict[str, Any]:
+def _get_settings():
+	"""Get Lead Intelligence Settings from the document cache"""
+	return frappe.get_cached_doc("Lead Intelligence Settings")
+
+
+def _get_settings_password(settings, fieldname: str) -> str:
+	"""Get a decrypted settings password (None if unset), decrypting each field once per request"""
+	passwords = getattr(frappe.local, "li_settings_passwords", None)
+	if passwords is None:
+		passwords = frappe.local.li_settings_passwords = {}
+	
+	if fieldname not in passwords:
+		passwords[fieldname] = settings.get_password(fieldname, raise_exception=False)
+	
+	return passwords[fieldname]
+
+
+# Per-service settings: plain fields are read directly, secrets are
+# decrypted only when the caller reads them
+_SERVICE_SPECS = {
+	"google_places": {
+		"enabled": "google_places_enabled",
+		"secrets": {"api_key": "google_places_api_key"},
+		"rate_limit": 1000,  # per day
+		"rate_window": "day"
+	},
+	"openai": {
+		"enabled": "openai_enabled",
+		"secrets": {"api_key": "openai_api_key"},
+		"rate_limit": 3000,  # per day
+		"rate_window": "day"
+	},
+	"sendgrid": {
+		"enabled": "sendgrid_enabled",
+		"secrets": {"api_key": "sendgrid_api_key"},
+		"rate_limit": 100,  # per hour
+		"rate_window": "hour"
+	},
+	"salesforce": {
+		"enabled": "salesforce_enabled",
+		"fields": {"client_id": "salesforce_client_id", "username": "salesforce_username"},
+		"secrets": {
+			"client_secret": "salesforce_client_secret",
+			"password": "salesforce_password",
+			"security_token": "salesforce_security_token"
+		}
+	}
+}
+
+
+# Rate limit windows: key suffix format and length in seconds
+_RATE_WINDOWS = {
+	"day": ("%Y-%m-%d", 86400),
+	"hour": ("%Y-%m-%d-%H", 3600)
+}
+
+
+class _ServiceSettings(dict):
+	"""Service settings dict that decrypts secret fields on first access"""
+	
+	def __init__(self, settings, secrets, values):
+		super().__init__(values)
+		self._settings = settings
+		self._secrets = secrets
+	
+	def __missing__(self, key):
+		if key not in self._secrets:
+			raise KeyError(key)
+		
+		value = self[key] = _get_settings_password(self._settings, self._secrets[key])
+		return value
+	
+	def get(self, key, default=None):
+		try:
+			return self[key]
+		except KeyError:
+			return default
+
+
+def get_api_settings(service_name: str, settings=None) -> Dict[str, Any]:
 	"""Get API settings for a specific service"""
 	try:
-		settings = frappe.get_single("Lead Intelligence Settings")
-		
-		if service_name == "google_places":
-			return {
-				"enabled": settings.google_places_enabled,
-				"api_key": settings.get_password("google_places_api_key"),
-				"rate_limit": 1000  # per day
-			}
-		
-		elif service_name == "openai":
-			return {
-				"enabled": settings.openai_enabled,
-				"api_key": settings.get_password("openai_api_key"),
-				"rate_limit": 3000  # per day
-			}
-		
-		elif service_name == "sendgrid":
-			return {
-				"enabled": settings.sendgrid_enabled,
-				"api_key": settings.get_password("sendgrid_api_key"),
-				"rate_limit": 100  # per hour
-			}
+		spec = _SERVICE_SPECS.get(service_name)
+		if not spec:
+			return {"enabled": False}
 		
-		elif service_name == "salesforce":
-			return {
-				"enabled": settings.salesforce_enabled,
-				"client_id": settings.salesforce_client_id,
-				"client_secret": settings.get_password("salesforce_client_secret"),
-				"username": settings.salesforce_username,
-				"password": settings.get_password("salesforce_password"),
-				"security_token": settings.get_password("salesforce_security_token")
-			}
+		settings = settings or _get_settings()
+		values = {"enabled": settings.get(spec["enabled"])}
+		for key, fieldname in spec.get("fields", {}).items():
+			values[key] = settings.get(fieldname)
+		if "rate_limit" in spec:
+			values["rate_limit"] = spec["rate_limit"]
 		
-		else:
-			return {"enabled": False}
+		return _ServiceSettings(settings, spec["secrets"], values)
 		
 	except Exception as e:
 		frappe.log_error(f"Error getting API settings for {service_name}: {str(e)}", "Lead Intelligence Utils")
@@ -59,29 +139,24 @@ def get_api_settings(service_name: str) -> Dict[str, Any]:
 
 
 def check_api_rate_limit(service_name: str, user: str = None) -> bool:
-	"""Check if API rate limit is exceeded"""
+	"""Count a call against the user's rate limit; False once the limit is exceeded"""
 	try:
 		if not user:
 			user = frappe.session.user
 		
-		# Get today's usage
-		from lead_intelligence.lead_intelligence.doctype.lead_intelligence_usage_stats.lead_intelligence_usage_stats import get_or_create_daily_stats
-		stats = get_or_create_daily_stats()
-		
-		# Get rate limits
-		api_settings = get_api_settings(service_name)
-		rate_limit = api_settings.get("rate_limit", 1000)
+		spec = _SERVICE_SPECS.get(service_name, {})
+		rate_limit = spec.get("rate_limit", 1000)
+		bucket_format, window = _RATE_WINDOWS[spec.get("rate_window", "day")]
 		
-		# Check current usage
-		current_usage = 0
-		if service_name == "google_places":
-			current_usage = stats.google_places_calls or 0
-		elif service_name == "openai":
-			current_usage = stats.openai_calls or 0
-		elif service_name == "sendgrid":
-			current_usage = stats.email_calls or 0
+		# Atomic INCR on a per-window key, so concurrent workers cannot race
+		# past the limit; the key expires with its window
+		cache = frappe.cache()
+		key = cache.make_key(f"li:rl:{service_name}:{user}:{now_datetime().strftime(bucket_format)}")
+		count = cache.incr(key)
+		if count == 1:
+			cache.expire(key, window)
 		
-		return current_usage < rate_limit
+		return count <= rate_limit
 		
 	except Exception as e:
 		frappe.log_error(f"Error checking rate limit for {service_name}: {str(e)}", "Lead Intelligence Utils")
@@ -104,11 +179,15 @@ def track_api_usage(service_name: str, cost: float = 0.0, user: str = None):
 # Data Validation Utilities
 def validate_email(email: str) -> bool:
 	"""Validate email address format"""
-	if not email:
+	if not email or len(email) > 254:
+		return False
+	
+	# Cheap string checks reject most bad input before the regex runs
+	local, sep, domain = email.rpartition('@')
+	if not sep or not local or '.' not in domain or ' ' in email:
 		return False
 	
-	pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-	return re.match(pattern, email) is not None
+	return _EMAIL_RE.match(email) is not None
 
 
 def validate_phone(phone: str) -> bool:
@@ -117,7 +196,7 @@ def validate_phone(phone: str) -> bool:
 		return False
 	
 	# Remove common formatting characters
-	clean_phone = re.sub(r'[\s\-\(\)\+]', '', str(phone))
+	clean_phone = _PHONE_STRIP_RE.sub('', str(phone))
 	
 	# Check if it's a valid phone number (7-15 digits)
 	return len(clean_phone) >= 7 and len(clean_phone) <= 15 and clean_phone.isdigit()
@@ -125,20 +204,20 @@ def validate_phone(phone: str) -> bool:
 
 def validate_url(url: str) -> bool:
 	"""Validate URL format"""
-	if not url:
+	if not url or not url.startswith(('http://', 'https://')):
 		return False
 	
-	pattern = r'^https?:\/\/(?:www\.)?[-a-zA-Z0-9@:%._\+~#=]{1,256}\.[a-zA-Z0-9()]{1,6}\b(?:[-a-zA-Z0-9()@:%_\+.~#?&=]*)$'
-	return re.match(pattern, url) is not None
+	return _URL_RE.match(url) is not None
 
 
+@functools.lru_cache(maxsize=8192)
 def clean_phone_number(phone: str) -> str:
 	"""Clean and format phone number"""
 	if not phone:
 		return ""
 	
 	# Remove all non-digit characters except +
-	cleaned = re.sub(r'[^\d\+]', '', str(phone))
+	cleaned = _PHONE_CLEAN_RE.sub('', str(phone))
 	
 	# If it starts with +, keep it
 	if cleaned.startswith('+'):
@@ -151,31 +230,27 @@ def clean_phone_number(phone: str) -> str:
 	return cleaned
 
 
+@functools.lru_cache(maxsize=8192)
 def normalize_company_name(company_name: str) -> str:
 	"""Normalize company name for better matching"""
 	if not company_name:
 		return ""
 	
 	# Remove common suffixes
-	suffixes = ['Inc', 'LLC', 'Corp', 'Corporation', 'Ltd', 'Limited', 'Co', 'Company']
-	normalized = company_name.strip()
-	
-	for suffix in suffixes:
-		pattern = rf'\b{suffix}\.?$'
-		normalized = re.sub(pattern, '', normalized, flags=re.IGNORECASE).strip()
-	
-	return normalized
+	return _COMPANY_SUFFIX_RE.sub('', company_name.strip()).strip()
 
 
 # Lead Scoring Utilities
 def calculate_lead_score(lead_data: Dict[str, Any]) -> int:
 	"""Calculate lead score based on data quality and completeness"""
 	score = 0
+	email = lead_data.get("email_id")
+	email_valid = validate_email(email) if email else False
 	
 	# Basic information completeness (40 points max)
 	if lead_data.get("lead_name"):
 		score += 10
-	if lead_data.get("email_id") and validate_email(lead_data.get("email_id")):
+	if email_valid:
 		score += 15
 	if lead_data.get("phone") and validate_phone(lead_data.get("phone")):
 		score += 10
@@ -183,13 +258,11 @@ def calculate_lead_score(lead_data: Dict[str, Any]) -> int:
 		score += 5
 	
 	# Email quality (20 points max)
-	if lead_data.get("email_id"):
-		email = lead_data.get("email_id")
-		if validate_email(email):
+	if email_valid:
+		score += 10
+		# Bonus for business domains
+		if email.rpartition('@')[2].lower() not in _FREE_EMAIL_DOMAINS:
 			score += 10
-			# Bonus for business domains
-			if not any(domain in email.lower() for domain in ["gmail", "yahoo", "hotmail", "outlook"]):
-				score += 10
 	
 	# Company information (20 points max)
 	if lead_data.get("company_name"):
@@ -210,6 +283,51 @@ def calculate_lead_score(lead_data: Dict[str, Any]) -> int:
 	return min(score, 100)  # Cap at 100
 
 
+def calculate_lead_scores(leads: List[Dict[str, Any]]) -> List[int]:
+	"""Score many leads at once, column by column; same points as calculate_lead_score
+	
+	Each check runs as one comprehension over its column with the precompiled
+	patterns, instead of a validate_* call per lead.
+	"""
+	match_email = _EMAIL_RE.match
+	match_url = _URL_RE.match
+	strip_phone = _PHONE_STRIP_RE.sub
+	
+	emails = [lead.get("email_id") or "" for lead in leads]
+	email_valid = [len(email) <= 254 and match_email(email) is not None for email in emails]
+	business_email = [
+		valid and email.rpartition('@')[2].lower() not in _FREE_EMAIL_DOMAINS
+		for valid, email in zip(email_valid, emails)
+	]
+	
+	phones = [strip_phone('', str(lead.get("phone") or "")) for lead in leads]
+	phone_valid = [7 <= len(phone) <= 15 and phone.isdigit() for phone in phones]
+	
+	has_company = [bool(lead.get("company_name")) for lead in leads]
+	websites = [lead.get("website") or "" for lead in leads]
+	website_valid = [
+		company and website.startswith(('http://', 'https://')) and match_url(website) is not None
+		for company, website in zip(has_company, websites)
+	]
+	
+	columns = [
+		(10, [bool(lead.get("lead_name")) for lead in leads]),
+		(25, email_valid),
+		(10, business_email),
+		(10, phone_valid),
+		(15, has_company),
+		(10, website_valid)
+	]
+	for fieldname in ("industry", "city", "state", "country"):
+		columns.append((5, [bool(lead.get(fieldname)) for lead in leads]))
+	
+	scores = [0] * len(leads)
+	for points, flags in columns:
+		scores = [score + points if flag else score for score, flag in zip(scores, flags)]
+	
+	return [min(score, 100) for score in scores]  # Cap at 100
+
+
 def determine_lead_quality(score: int) -> str:
 	"""Determine lead quality based on score"""
 	if score >= 80:
@@ -227,21 +345,60 @@ def enrich_lead_data(lead_doc) -> Dict[str, Any]:
 	"""Enrich lead data using external services"""
 	enrichment_data = {}
 	
+	# Neither service can do anything with a malformed address
+	email = lead_doc.get("email_id")
+	if not validate_email(email):
+		return enrichment_data
+	
 	try:
 		# Get enrichment settings
-		settings = frappe.get_single("Lead Intelligence Settings")
+		settings = _get_settings()
+		lookups = {}
 		
 		# Enrich with Clearbit (if enabled)
-		if settings.clearbit_enabled and settings.get_password("clearbit_api_key"):
-			clearbit_data = enrich_with_clearbit(lead_doc.email_id, settings.get_password("clearbit_api_key"))
-			if clearbit_data:
-				enrichment_data["clearbit"] = clearbit_data
+		if settings.clearbit_enabled:
+			api_key = _get_settings_password(settings, "clearbit_api_key")
+			if api_key:
+				lookups["clearbit"] = (_clearbit_lookup, api_key)
 		
 		# Enrich with Hunter.io (if enabled)
-		if settings.hunter_enabled and settings.get_password("hunter_api_key"):
-			hunter_data = enrich_with_hunter(lead_doc.email_id, settings.get_password("hunter_api_key"))
-			if hunter_data:
-				enrichment_data["hunter"] = hunter_data
+		if settings.hunter_enabled:
+			api_key = _get_settings_password(settings, "hunter_api_key")
+			if api_key:
+				lookups["hunter"] = (_hunter_lookup, api_key)
+		
+		# Serve repeat emails from the cache, only call services on a miss
+		pending = {}
+		for source, lookup in lookups.items():
+			data = _get_cached_enrichment(source, email)
+			if data is None:
+				pending[source] = lookup
+			elif data:
+				enrichment_data[source] = data
+		
+		# Skip the paid Clearbit call for emails Hunter already rejected
+		if "clearbit" in pending and _hunter_rejected(enrichment_data.get("hunter")):
+			del pending["clearbit"]
+			_cache_enrichment("clearbit", email, {})
+		
+		if not pending:
+			return enrichment_data
+		
+		# Call the services concurrently. The lookups only do HTTP, errors are
+		# logged and results cached back here on the request thread.
+		with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+			futures = {
+				source: executor.submit(lookup, email, api_key)
+				for source, (lookup, api_key) in pending.items()
+			}
+		
+		for source, future in futures.items():
+			data, error = future.result()
+			if error:
+				frappe.log_error(f"{_ENRICHMENT_LABELS[source]} enrichment error: {str(error)}", "Lead Intelligence Utils")
+			_cache_enrichment(source, email, data)
+			if data:
+				enrichment_data[source] = data
 		
 		return enrichment_data
 		
@@ -250,35 +407,103 @@ def enrich_lead_data(lead_doc) -> Dict[str, Any]:
 		return {}
 
 
-def enrich_with_clearbit(email: str, api_key: str) -> Optional[Dict[str, Any]]:
-	"""Enrich lead data using Clearbit API"""
+_ENRICHMENT_LABELS = {"clearbit": "Clearbit", "hunter": "Hunter"}
+ENRICHMENT_CACHE_TTL = 7 * 86400
+# Known-missing emails are re-checked sooner
+ENRICHMENT_MISS_TTL = 86400
+
+
+def _hunter_rejected(hunter_data) -> bool:
+	"""Whether a Hunter verification marked the email as invalid"""
+	return bool(hunter_data) and (hunter_data.get("data") or {}).get("status") == "invalid"
+
+
+def _enrichment_cache_key(source: str, email: str) -> str:
+	return f"li:{source}:{hashlib.sha1((email or '').lower().encode()).hexdigest()}"
+
+
+def _get_cached_enrichment(source: str, email: str):
+	"""Cached response for the email: a dict, {} if known missing, None if not cached"""
+	return frappe.cache().get_value(_enrichment_cache_key(source, email))
+
+
+def _cache_enrichment(source: str, email: str, data):
+	"""Cache a lookup result; failed lookups (None) are not cached"""
+	if data is None:
+		return
+	
+	expires_in_sec = ENRICHMENT_CACHE_TTL if data else ENRICHMENT_MISS_TTL
+	frappe.cache().set_value(_enrichment_cache_key(source, email), data, expires_in_sec=expires_in_sec)
+
+
+# Shared session so repeated enrichment calls reuse keep-alive connections,
+# with a short retry on gateway errors
+_HTTP = requests.Session()
+_HTTP.mount("https://", HTTPAdapter(
+	pool_connections=16,
+	pool_maxsize=64,
+	max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+))
+
+
+def _clearbit_lookup(email: str, api_key: str):
+	"""Fetch the Clearbit person record as (data, error), without touching Frappe"""
 	try:
-		url = f"https://person.clearbit.com/v2/people/find?email={email}"
-		headers = {"Authorization": f"Bearer {api_key}"}
-		
-		response = requests.get(url, headers=headers, timeout=10)
-		if response.status_code == 200:
-			return response.json()
-		
+		response = _HTTP.get(
+			"https://person.clearbit.com/v2/people/find",
+			params={"email": email},
+			headers={"Authorization": f"Bearer {api_key}"},
+			timeout=10
+		)
+		return _lookup_result(response), None
 	except Exception as e:
-		frappe.log_error(f"Clearbit enrichment error: {str(e)}", "Lead Intelligence Utils")
-	
+		return None, e
+
+
+def _hunter_lookup(email: str, api_key: str):
+	"""Fetch the Hunter.io verification as (data, error), without touching Frappe"""
+	try:
+		response = _HTTP.get(
+			"https://api.hunter.io/v2/email-verifier",
+			params={"email": email, "api_key": api_key},
+			timeout=10
+		)
+		return _lookup_result(response), None
+	except Exception as e:
+		return None, e
+
+
+def _lookup_result(response):
+	"""Response JSON, {} when the service does not know the email, None otherwise"""
+	if response.status_code == 200:
+		return response.json()
+	if response.status_code == 404:
+		return {}
 	return None
 
 
+def enrich_with_clearbit(email: str, api_key: str) -> Optional[Dict[str, Any]]:
+	"""Enrich lead data using Clearbit API"""
+	data = _get_cached_enrichment("clearbit", email)
+	if data is None:
+		data, error = _clearbit_lookup(email, api_key)
+		if error:
+			frappe.log_error(f"Clearbit enrichment error: {str(error)}", "Lead Intelligence Utils")
+		_cache_enrichment("clearbit", email, data)
+	
+	return data or None
+
+
 def enrich_with_hunter(email: str, api_key: str) -> Optional[Dict[str, Any]]:
 	"""Enrich lead data using Hunter.io API"""
-	try:
-		url = f"https://api.hunter.io/v2/email-verifier?email={email}&api_key={api_key}"
-		
-		response = requests.get(url, timeout=10)
-		if response.status_code == 200:
-			return response.json()
-		
-	except Exception as e:
-		frappe.log_error(f"Hunter enrichment error: {str(e)}", "Lead Intelligence Utils")
+	data = _get_cached_enrichment("hunter", email)
+	if data is None:
+		data, error = _hunter_lookup(email, api_key)
+		if error:
+			frappe.log_error(f"Hunter enrichment error: {str(error)}", "Lead Intelligence Utils")
+		_cache_enrichment("hunter", email, data)
 	
-	return None
+	return data or None
 
 
 # Email Utilities
@@ -287,8 +512,7 @@ def send_notification_email(recipients: List[str], subject: str, message: str, t
 	try:
 		if template:
 			# Use email template
-		from frappe.email.queue import send
-			send(
+			frappe.sendmail(
 				recipients=recipients,
 				subject=subject,
 				message=message,
@@ -297,8 +521,7 @@ def send_notification_email(recipients: List[str], subject: str, message: str, t
 			)
 		else:
 			# Send simple email
-			from frappe.email.queue import send
-			send(
+			frappe.sendmail(
 				recipients=recipients,
 				subject=subject,
 				message=message
@@ -311,18 +534,14 @@ def send_notification_email(recipients: List[str], subject: str, message: str, t
 def get_email_template_content(template_name: str, context: Dict[str, Any] = None) -> Dict[str, str]:
 	"""Get email template content with context"""
 	try:
-		template = frappe.get_doc("Email Template", template_name)
+		template = frappe.get_cached_doc("Email Template", template_name)
 		
 		if context:
-			# Replace template variables
-			subject = template.subject
-			content = template.response
-			
-			for key, value in context.items():
-				subject = subject.replace(f"{{ {key} }}", str(value))
-				content = content.replace(f"{{ {key} }}", str(value))
-			
-			return {"subject": subject, "content": content}
+			# Render template variables with the compiled Jinja templates
+			return {
+				"subject": _compile_template(template.subject or "").render(context),
+				"content": _compile_template(template.response or "").render(context)
+			}
 		else:
 			return {"subject": template.subject, "content": template.response}
 		
@@ -331,58 +550,95 @@ def get_email_template_content(template_name: str, context: Dict[str, Any] = Non
 		return {"subject": "", "content": ""}
 
 
+@functools.lru_cache(maxsize=256)
+def _compile_template(source: str):
+	"""Compile template text once; edited templates have new text and miss the cache"""
+	return frappe.get_jenv().from_string(source)
+
+
 # Security Utilities
 def generate_api_key() -> str:
 	"""Generate a secure API key"""
-	import secrets
 	return secrets.token_urlsafe(32)
 
 
-def hash_sensitive_data(data: str) -> str:
+def hash_sensitive_data(data: Union[str, bytes]) -> str:
 	"""Hash sensitive data for storage"""
-	return hashlib.sha256(data.encode()).hexdigest()
+	return hashlib.sha256(_to_bytes(data)).hexdigest()
+
+
+def hash_sensitive_data_blake3(data: Union[str, bytes]) -> str:
+	"""Hash sensitive data with BLAKE3 (needs the optional blake3 package)"""
+	import blake3
+	return blake3.blake3(_to_bytes(data)).hexdigest()
+
+
+def hash_many(items: Iterable[Union[str, bytes]], prefix: Union[str, bytes] = b"") -> List[str]:
+	"""SHA-256 hash many values, hashing a shared prefix only once"""
+	base = hashlib.sha256(_to_bytes(prefix))
+	hashes = []
+	for item in items:
+		digest = base.copy()
+		digest.update(_to_bytes(item))
+		hashes.append(digest.hexdigest())
+	
+	return hashes
+
+
+def _to_bytes(data: Union[str, bytes]) -> bytes:
+	return data if isinstance(data, bytes) else data.encode()
 
 
 def encrypt_data(data: str, key: str) -> str:
 	"""Encrypt sensitive data"""
-	try:
-		from cryptography.fernet import Fernet
-		f = Fernet(key.encode())
-		return f.encrypt(data.encode()).decode()
-	except Exception:
-		# Fallback to base64 encoding
-		return base64.b64encode(data.encode()).decode()
+	return _fernet(key).encrypt(data.encode()).decode()
 
 
 def decrypt_data(encrypted_data: str, key: str) -> str:
 	"""Decrypt sensitive data"""
 	try:
-		from cryptography.fernet import Fernet
-		f = Fernet(key.encode())
-		return f.decrypt(encrypted_data.encode()).decode()
-	except Exception:
-		# Fallback to base64 decoding
-		return base64.b64decode(encrypted_data.encode()).decode()
+		from cryptography.fernet import InvalidToken
+		fernet = _fernet(key)
+	except (ImportError, ValueError):
+		# The old encrypt_data stored base64 whenever Fernet could not be built
+		return _fallback_decode(encrypted_data)
+	
+	try:
+		return fernet.decrypt(encrypted_data.encode()).decode()
+	except InvalidToken:
+		# Values written by the old base64 fallback are not Fernet tokens
+		return _fallback_decode(encrypted_data)
+
+
+@functools.lru_cache(maxsize=8)
+def _fernet(key: str):
+	from cryptography.fernet import Fernet
+	return Fernet(key.encode())
+
+
+def _fallback_decode(encoded_data: str) -> str:
+	"""Decode legacy base64-only values; this is encoding, not encryption"""
+	return base64.b64decode(encoded_data.encode(), validate=True).decode()
 
 
 # Date and Time Utilities
 def get_local_datetime(utc_datetime: datetime) -> datetime:
 	"""Convert UTC datetime to local timezone"""
 	try:
-		from frappe.utils import get_system_timezone
-		import pytz
-		
-		system_tz = pytz.timezone(get_system_timezone())
-		utc_tz = pytz.UTC
-		
 		if utc_datetime.tzinfo is None:
-			utc_datetime = utc_tz.localize(utc_datetime)
+			utc_datetime = utc_datetime.replace(tzinfo=timezone.utc)
 		
-		return utc_datetime.astimezone(system_tz)
+		return utc_datetime.astimezone(_zoneinfo(get_system_timezone()))
 	except Exception:
 		return utc_datetime
 
 
+@functools.lru_cache(maxsize=32)
+def _zoneinfo(tz_name: str) -> ZoneInfo:
+	# Keyed by name, so sites with different system timezones each get their own
+	return ZoneInfo(tz_name)
+
+
 def format_duration(seconds: int) -> str:
 	"""Format duration in human-readable format"""
 	if seconds < 60:
@@ -400,40 +656,72 @@ def format_duration(seconds: int) -> str:
 
 
 # Data Export Utilities
-def export_to_csv(data: List[Dict[str, Any]], filename: str) -> str:
-	"""Export data to CSV format"""
+def export_to_csv(data: List[Dict[str, Any]], filename: str = None, file_obj=None) -> str:
+	"""Export data to CSV format
+	
+	With file_obj the rows are written straight to it and "" is returned,
+	so the whole CSV never sits in memory.
+	"""
 	try:
-		import csv
-		import io
-		
 		if not data:
 			return ""
 		
-		output = io.StringIO()
+		output = file_obj if file_obj is not None else io.StringIO()
 		writer = csv.DictWriter(output, fieldnames=data[0].keys())
 		writer.writeheader()
 		writer.writerows(data)
 		
-		return output.getvalue()
+		return "" if file_obj is not None else output.getvalue()
 		
 	except Exception as e:
 		frappe.log_error(f"Error exporting to CSV: {str(e)}", "Lead Intelligence Utils")
 		return ""
 
 
+def export_to_csv_iter(data: List[Dict[str, Any]]):
+	"""Yield CSV text line by line so large exports can be streamed"""
+	if not data:
+		return
+	
+	buffer = io.StringIO()
+	writer = csv.DictWriter(buffer, fieldnames=data[0].keys())
+	
+	def drain():
+		line = buffer.getvalue()
+		buffer.seek(0)
+		buffer.truncate(0)
+		return line
+	
+	writer.writeheader()
+	yield drain()
+	
+	for row in data:
+		writer.writerow(row)
+		yield drain()
+
+
 def export_to_excel(data: List[Dict[str, Any]], filename: str) -> bytes:
 	"""Export data to Excel format"""
 	try:
-		import pandas as pd
-		import io
-		
 		if not data:
 			return b""
 		
-		df = pd.DataFrame(data)
+		if Workbook is None:
+			raise ImportError("openpyxl is required for Excel exports")
+		
+		# Columns in order of first appearance, as a DataFrame would build them
+		columns = list(dict.fromkeys(key for row in data for key in row))
+		
+		# Write-only mode streams rows out instead of keeping a cell object
+		# for every value in memory
+		workbook = Workbook(write_only=True)
+		sheet = workbook.create_sheet()
+		sheet.append(columns)
+		for row in data:
+			sheet.append([row.get(column) for column in columns])
+		
 		output = io.BytesIO()
-		df.to_excel(output, index=False, engine='openpyxl')
-		output.seek(0)
+		workbook.save(output)
 		
 		return output.getvalue()
 		
@@ -469,24 +757,74 @@ def clear_cached_data(cache_key: str):
 
 # Logging Utilities
 def log_activity(activity_type: str, details: Dict[str, Any], user: str = None):
-	"""Log activity for audit trail"""
+	"""Log activity for audit trail
+	
+	Entries are buffered for the transaction, written by flush_activity_log just before it
+	commits and discarded if it rolls back.
+	"""
 	try:
 		if not user:
 			user = frappe.session.user
 		
-		activity_log = frappe.get_doc({
-			"doctype": "Activity Log",
-			"subject": f"Lead Intelligence: {activity_type}",
-			"content": json.dumps(details, indent=2),
-			"user": user,
-			"ip_address": frappe.local.request_ip if hasattr(frappe.local, 'request_ip') else None
-		})
-		activity_log.insert(ignore_permissions=True)
+		buffer = getattr(frappe.local, "li_activity_buffer", None)
+		if not buffer:
+			buffer = frappe.local.li_activity_buffer = []
+			frappe.db.before_commit.add(flush_activity_log)
+			frappe.db.after_rollback.add(_discard_activity_log)
+			
+			# Make sure the surrounding request commits even if it is a GET
+			frappe.local.flags.commit = True
+		
+		buffer.append((
+			f"Lead Intelligence: {activity_type}",
+			_dumps_compact(details),
+			user,
+			getattr(frappe.local, "request_ip", None),
+			frappe.session.user
+		))
 		
 	except Exception as e:
 		frappe.log_error(f"Error logging activity: {str(e)}", "Lead Intelligence Utils")
 
 
+def _dumps_compact(data) -> str:
+	"""Serialise to compact JSON"""
+	return json.dumps(data, separators=(",", ":"), default=str)
+
+
+_ACTIVITY_LOG_FIELDS = (
+	"name", "creation", "modified", "owner", "modified_by",
+	"subject", "content", "user", "full_name", "ip_address", "communication_date"
+)
+
+
+def flush_activity_log():
+	"""Write buffered activity log entries in one multi-row INSERT
+	
+	Registered as a before_commit callback, so the entries land in the same transaction.
+	"""
+	buffer = getattr(frappe.local, "li_activity_buffer", None)
+	if not buffer:
+		return
+	
+	frappe.local.li_activity_buffer = []
+	
+	timestamp = now()
+	values = [
+		(
+			frappe.generate_hash(length=10), timestamp, timestamp, owner, owner,
+			subject, content, user, get_fullname(user), ip_address, timestamp
+		)
+		for subject, content, user, ip_address, owner in buffer
+	]
+	frappe.db.bulk_insert("Activity Log", _ACTIVITY_LOG_FIELDS, values)
+
+
+def _discard_activity_log():
+	"""Drop buffered entries of a rolled back transaction (after_rollback callback)"""
+	frappe.local.li_activity_buffer = []
+
+
 def get_system_health() -> Dict[str, Any]:
 	"""Get system health status"""
 	try:
@@ -505,11 +843,13 @@ def get_system_health() -> Dict[str, Any]:
 			cache_status = "unhealthy"
 		
 		# Check API services
-		api_status = {}
+		# Only the *_enabled flags are needed, so no passwords are decrypted
 		services = ["google_places", "openai", "sendgrid"]
-		for service in services:
-			settings = get_api_settings(service)
-			api_status[service] = "enabled" if settings.get("enabled") else "disabled"
+		settings = _get_settings()
+		api_status = {
+			service: "enabled" if settings.get(f"{service}_enabled") else "disabled"
+			for service in services
+		}
 		
 		return {
 			"database": db_status,
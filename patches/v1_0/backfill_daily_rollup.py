@@ -0,0 +1,12 @@
+# Copyright (c) 2024, Frappe Technologies and contributors
+# For license information, please see license.txt
+
+from lead_intelligence.doctype.lead_intelligence_daily_rollup.lead_intelligence_daily_rollup import update_daily_rollup
+
+# Usage stats older than this are removed by the daily cleanup
+USAGE_STATS_RETENTION_DAYS = 90
+
+
+def execute():
+	"""Fill the daily rollup from the retained usage stats so existing trends keep their history."""
+	update_daily_rollup(days=USAGE_STATS_RETENTION_DAYS, commit=False)
@@ -0,0 +1,101 @@
+# Copyright (c) 2024, Frappe Technologies and Contributors
+# See license.txt
+
+import base64
+import frappe
+import unittest
+from lead_intelligence.utils import (
+	calculate_lead_score,
+	calculate_lead_scores,
+	decrypt_data,
+	encrypt_data,
+	get_email_template_content
+)
+
+class TestLeadIntelligenceUtils(unittest.TestCase):
+	"""Test cases for Lead Intelligence utilities."""
+	
+	def tearDown(self):
+		"""Clean up test data."""
+		frappe.db.rollback()
+	
+	def test_email_template_rendering(self):
+		"""Test rendering template variables into an Email Template."""
+		template = frappe.get_doc({
+			"doctype": "Email Template",
+			"name": "Test Lead Intelligence Template",
+			"subject": "Hello {{ first_name }}",
+			"response": "<p>Welcome to {{ company_name }}</p>"
+		})
+		template.insert(ignore_permissions=True)
+		
+		content = get_email_template_content(template.name, {"first_name": "Jane", "company_name": "Acme"})
+		
+		self.assertEqual(content["subject"], "Hello Jane")
+		self.assertEqual(content["content"], "<p>Welcome to Acme</p>")
+	
+	def test_email_template_without_context(self):
+		"""Test the raw template is returned when no context is given."""
+		template = frappe.get_doc({
+			"doctype": "Email Template",
+			"name": "Test Lead Intelligence Raw Template",
+			"subject": "Hello {{ first_name }}",
+			"response": "Raw body"
+		})
+		template.insert(ignore_permissions=True)
+		
+		content = get_email_template_content(template.name)
+		
+		self.assertEqual(content["subject"], "Hello {{ first_name }}")
+		self.assertEqual(content["content"], "Raw body")
+	
+	def test_calculate_lead_scores_matches_single(self):
+		"""Test batch scoring gives the same scores as scoring each lead."""
+		leads = [
+			{
+				"lead_name": "Jane Doe",
+				"email_id": "jane@acme.com",
+				"phone": "+1 555 123 4567",
+				"company_name": "Acme",
+				"website": "https://acme.com",
+				"industry": "Manufacturing",
+				"city": "Austin",
+				"state": "Texas",
+				"country": "United States"
+			},
+			{
+				"lead_name": "John Doe",
+				"email_id": "john@gmail.com",
+				"company_name": "Doe Consulting"
+			},
+			{
+				"email_id": "not-an-email",
+				"phone": "abc",
+				"website": "acme"
+			},
+			{
+				"lead_name": "No Company",
+				"email_id": "a b@example.com",
+				"phone": "(555) 123-4567",
+				"website": "https://example.com",
+				"country": "India"
+			},
+			{}
+		]
+		
+		self.assertEqual(calculate_lead_scores(leads), [calculate_lead_score(lead) for lead in leads])
+		self.assertEqual(calculate_lead_scores(leads)[0], 100)
+		self.assertEqual(calculate_lead_scores(leads)[-1], 0)
+	
+	def test_encrypt_decrypt_round_trip(self):
+		"""Test values encrypted with a Fernet key decrypt back."""
+		from cryptography.fernet import Fernet
+		key = Fernet.generate_key().decode()
+		
+		self.assertEqual(decrypt_data(encrypt_data("secret", key), key), "secret")
+	
+	def test_decrypt_legacy_base64_with_bad_key(self):
+		"""Test legacy base64 values written when no Fernet could be built still decrypt."""
+		legacy = base64.b64encode(b"secret").decode()
+		
+		self.assertEqual(decrypt_data(legacy, "not-a-fernet-key"), "secret")